@@ -4,13 +4,19 @@
 import tkinter as tk
 from tkinter import messagebox, filedialog
 import os
-import shutil
+import re
 import time
 import platform
 import sv_ttk
-from config import DATA_FILE, IMAGE_DIR, ICONS, POSTIT_COLORS
-from ui_components import CustomInputDialog, ColorPickerDialog
+import profiling
+from config import (DATA_FILE, IMAGE_DIR, ICONS, POSTIT_COLORS, LAZY_LOAD_THEMES, WRITE_BEHIND_MS,
+                    DB_PERFORMANCE_MODE, DB_PRAGMAS, IMAGE_DERIVATIVE_SIZES, IMAGE_STORE_HARDLINKS,
+                    SEARCH_DEBOUNCE_MS, SEARCH_CHUNK_SIZE, IMAGE_IMPORT_WORKERS)
+from ui_components import CustomInputDialog, ColorPickerDialog, ProfilerStatsWindow
 from data_manager import DataManager
+from note_store import Note
+from image_store import ImageStore
+from image_import import ImageImporter
 from satellite_manager import SatelliteManager
 from ui_builder import UIBuilder
 
@@ -25,7 +31,7 @@ class Millon_note:
     Clase principal que encapsula toda la lógica y el estado de la aplicación.
     Actúa como el controlador central, coordinando la UI, los datos y las acciones del usuario.
     """
-    def __init__(self, root):
+    def __init__(self, root, db_file=DATA_FILE):
         # --- 1. Inicialización y Configuración del Sistema ---
         """
         Constructor de la clase Millon_note.
@@ -33,8 +39,12 @@ class Millon_note:
         Inicializa la aplicación Nexus Notes con la ventana principal dada.
         Carga los datos de la base de datos y configura el estado de la aplicación.
         Inicializa la UI y el gestor de satélites flotantes.
+
+        El tiempo de cada fase del arranque queda en `self.startup_timings` (en segundos).
         """
         self.root = root
+        self.startup_timings = {}
+        phase_start = time.perf_counter()
        # Definimos la rutas y archivos de la aplicación.
         self.IMAGE_DIR = IMAGE_DIR
         self.ICONS = ICONS
@@ -43,27 +53,58 @@ class Millon_note:
         if not os.path.exists(self.IMAGE_DIR):
             os.makedirs(self.IMAGE_DIR)
         # Inicializamos la base de datos
-        self.data_manager = DataManager(DATA_FILE)
+        self.data_manager = DataManager(
+            db_file, write_behind_ms=WRITE_BEHIND_MS, schedule=self.root.after,
+            pragmas=DB_PRAGMAS if DB_PERFORMANCE_MODE else None, background_writer=DB_PERFORMANCE_MODE
+        )
+
+        self.image_store = ImageStore(self.IMAGE_DIR, self.data_manager, IMAGE_DERIVATIVE_SIZES,
+                                      allow_hardlinks=IMAGE_STORE_HARDLINKS)
+        # Notas que quedaron sin tema en versiones anteriores: se borran y sus imágenes se
+        # retiran del almacén si ninguna otra nota las usa.
+        for path in self.data_manager.delete_orphan_notes():
+            self.image_store.release(path)
+        # Las imágenes se copian y procesan fuera del hilo de Tk. Mientras tanto, cada una se
+        # muestra en la lista con una nota provisional (ID negativo): placeholder ID -> [tema, nota].
+        self.image_importer = ImageImporter(self.root, self.image_store, IMAGE_IMPORT_WORKERS)
+        self.pending_imports = {}
+        self._next_placeholder_id = -1
 
         # Cargamos los datos de la base de datos
-        self.datos, self.app_settings = self.data_manager.load_data()
+        # NoteStore: las notas indexadas por ID, por tema y por estado de anclaje.
+        self.note_store, self.app_settings = self.data_manager.load_data(lazy=LAZY_LOAD_THEMES)
+        self.startup_timings["load_data"] = time.perf_counter() - phase_start
         self.current_theme = self.app_settings.get("theme", "dark")
         self.sidebar_visible = self.app_settings.get("sidebar_visible", True)
         # Inicializamos el estado de la aplicación
         self.current_selected_theme = None
-        self.open_satellites = {}
-        self.listbox_to_note_id_map = {}
+        self.open_satellites = {} # ID de nota -> ventana satélite
+        # Lo que muestra ahora la lista de apuntes: IDs y textos por fila, para actualizarla por diferencias.
+        self.listbox_note_ids = []
+        self._listbox_labels = []
+        # Búsqueda en vivo: temporizador del debounce, generación de la búsqueda en curso
+        # (las porciones de una búsqueda obsoleta se descartan) y último resultado (tema,
+        # consulta, IDs, versión de los datos), que se acota si la consulta se amplía.
+        self._search_after_id = None
+        self._search_generation = 0
+        self._last_search = None
+        self._search_trace_muted = False # True mientras el propio código vacía el buscador
         # Inicializamos la UI
         self.ui_builder = UIBuilder(self)
         self.satellite_manager = SatelliteManager(self)
 
         # --- 2. Arranque del Sistema ---
         # Configuramos los fondos y los estilos
+        phase_start = time.perf_counter()
         self.ui_builder.setup_fonts()
         self.ui_builder.setup_ui()
 
         self._initialize_view()
+        self.startup_timings["ui_build"] = time.perf_counter() - phase_start
+
+        phase_start = time.perf_counter()
         self.satellite_manager.initialize_satellites()
+        self.startup_timings["satellites"] = time.perf_counter() - phase_start
 
     def _initialize_view(self):
         """Configura el estado inicial de la vista principal."""
@@ -74,14 +115,20 @@ class Millon_note:
         else:
             self.sidebar_toggle_frame.pack(side='left', fill='y', padx=(5,0), pady=5)
 
-        if self.datos:
+        if self.note_store:
             self.listbox_temas.selection_set(0)
             self.listbox_temas.event_generate("<<ListboxSelect>>")
 
     def on_close(self):
+        self.image_importer.shutdown()
+        self.satellite_manager.shutdown()
         self.data_manager.close()
         self.root.destroy()
 
+    def show_profiler_stats(self, event=None):
+        """Abre la ventana con los tiempos medidos por profiling (solo con el perfilado activo)."""
+        ProfilerStatsWindow(self.root, profiling.snapshot, profiling.dump_json, self.font_normal)
+
     # --- Métodos de Ayuda Internos (Lógica a prueba de fallos) ---
 
     def _get_selected_note_id(self):
@@ -89,39 +136,152 @@ class Millon_note:
         if not self.listbox_apuntes.curselection():
             return None
         listbox_index = self.listbox_apuntes.curselection()[0]
-        return self.listbox_to_note_id_map.get(listbox_index)
+        return self.listbox_note_ids[listbox_index] if listbox_index < len(self.listbox_note_ids) else None
 
     def _get_note_by_id(self, note_id):
         """Busca una nota en la estructura de datos en memoria por su ID único."""
-        if not self.current_selected_theme or not note_id:
+        if not note_id:
             return None
-        for note in self.datos.get(self.current_selected_theme, []):
-            if note['id'] == note_id:
-                return note
-        return None
+        return self.note_store.get(note_id)
+
+    def _ensure_theme_loaded(self, theme):
+        """Materializa todas las notas de un tema cargado de forma diferida.
+
+        Las notas ancladas ya están en memoria y sus satélites tienen referencias a
+        esos objetos, así que NoteStore.load_theme los conserva en lugar de duplicarlos.
+        """
+        if theme in self.note_store.partial_themes:
+            self.note_store.load_theme(theme, self.data_manager.load_theme_notes(theme))
 
     def _refresh_notes_view(self, select_last=False):
         """Refresca la lista de apuntes en la UI, manteniendo la consistencia del mapeo ID."""
-        self.listbox_apuntes.delete(0, tk.END)
-        self.listbox_to_note_id_map.clear()
-        search_term = self.search_var.get().lower()
+        # Cualquier refresco deja obsoletas la búsqueda programada y la que esté en curso.
+        if self._search_after_id is not None:
+            self.root.after_cancel(self._search_after_id)
+            self._search_after_id = None
+        self._search_generation += 1
+        search_term = self.search_var.get().strip()
+
+        if not self.current_selected_theme or self.current_selected_theme not in self.note_store:
+            self._fill_notes_listbox([])
+            return
 
-        if not self.current_selected_theme or self.current_selected_theme not in self.datos:
+        if search_term:
+            self._start_search(self.current_selected_theme, search_term, select_last)
+        else:
+            notes = self.note_store.notes(self.current_selected_theme)
+            notes.extend(note for theme, note in self.pending_imports.values() if theme == self.current_selected_theme)
+            self._fill_notes_listbox(notes, select_last)
+
+    def _fill_notes_listbox(self, notes, select_last=False):
+        """
+        Muestra las notas dadas en la lista de apuntes tocando solo las filas que cambian.
+
+        Se comparan (ID, texto) con lo que ya se muestra: el prefijo y el sufijo comunes se
+        dejan intactos y solo el tramo intermedio se borra y se vuelve a insertar, con una
+        única llamada a `insert`. Añadir, renombrar o borrar una nota cuesta así un par de
+        operaciones de Tk. La selección y el desplazamiento se conservan por ID de nota.
+        """
+        listbox = self.listbox_apuntes
+        new_ids = [note['id'] for note in notes]
+        prefixes = {"image": f"{self.ICONS['image']} ", "pending": f"{self.ICONS['pending']} "}
+        new_labels = [prefixes.get(note.get("type"), "") + note.get("titulo", "Sin Título") for note in notes]
+        old_ids, old_labels = self.listbox_note_ids, self._listbox_labels
+
+        selected_id = self._get_selected_note_id()
+        top_index = listbox.nearest(0)
+        top_id = old_ids[top_index] if 0 <= top_index < len(old_ids) else None
+
+        start, old_end, new_end = 0, len(old_ids), len(new_ids)
+        while start < min(old_end, new_end) and old_ids[start] == new_ids[start] and old_labels[start] == new_labels[start]:
+            start += 1
+        while (old_end > start and new_end > start and old_ids[old_end - 1] == new_ids[new_end - 1]
+               and old_labels[old_end - 1] == new_labels[new_end - 1]):
+            old_end -= 1
+            new_end -= 1
+
+        if old_end > start:
+            listbox.delete(start, old_end - 1)
+        if new_end > start:
+            listbox.insert(start, *new_labels[start:new_end])
+        self.listbox_note_ids, self._listbox_labels = new_ids, new_labels
+
+        if select_last and new_ids:
+            listbox.selection_clear(0, tk.END)
+            listbox.selection_set(tk.END)
+            listbox.see(tk.END)
+            return
+        # Las filas fuera del tramo cambiado conservan la selección; si estaba dentro, se repone.
+        if selected_id is not None and self._get_selected_note_id() != selected_id:
+            listbox.selection_clear(0, tk.END)
+            if selected_id in new_ids:
+                listbox.selection_set(new_ids.index(selected_id))
+        new_top = listbox.nearest(0)
+        if top_id is not None and 0 <= new_top < len(new_ids) and new_ids[new_top] != top_id and top_id in new_ids:
+            listbox.yview(new_ids.index(top_id))
+
+    # --- Búsqueda en vivo ---
+
+    def _on_search_changed(self, *args):
+        """Cada pulsación reinicia la espera: solo se busca cuando el usuario hace una pausa."""
+        if self._search_trace_muted:
             return
+        if self._search_after_id is not None:
+            self.root.after_cancel(self._search_after_id)
+        self._search_after_id = self.root.after(SEARCH_DEBOUNCE_MS, self._run_search)
+
+    def _clear_search_text(self):
+        """Vacía el buscador sin que su trace programe otra búsqueda: quien llama ya refresca."""
+        self._search_trace_muted = True
+        try:
+            self.search_var.set("")
+        finally:
+            self._search_trace_muted = False
+
+    def _run_search(self):
+        self._search_after_id = None
+        self._refresh_notes_view()
 
-        listbox_index = 0
-        for note in self.datos[self.current_selected_theme]:
-            titulo = note.get("titulo", "").lower()
-            contenido = str(note.get("contenido", "")).lower()
+    def _start_search(self, theme, query, select_last):
+        """
+        Lanza la búsqueda de `query` en `theme`.
 
-            if search_term in titulo or search_term in contenido:
-                prefix = f"{self.ICONS['image']} " if note.get("type") == "image" else ""
-                self.listbox_apuntes.insert(tk.END, prefix + note.get("titulo", "Sin Título"))
-                self.listbox_to_note_id_map[listbox_index] = note['id']
-                listbox_index += 1
+        Si la consulta amplía la anterior sobre los mismos datos, sus resultados son un
+        subconjunto de los anteriores: se filtran esos en memoria, por porciones, en lugar de
+        volver a consultar la base de datos. Si no, se consulta el índice de búsqueda; esa
+        consulta FTS sí se hace de una vez en el hilo de Tk (solo el acotado va por porciones).
+        """
+        generation = self._search_generation
+        get_note = self.note_store.get
+        previous = self._last_search
+        if (previous and previous[0] == theme and previous[3] == self.data_manager.search_version
+                and query.startswith(previous[1]) and re.search(r"[^\W_]", previous[1])):
+            candidates = [note for note in map(get_note, previous[2]) if note is not None]
+            match = self.data_manager.note_matcher(query)
+            self._narrow_search(generation, theme, query, candidates, match, 0, [], select_last)
+        else:
+            matching_ids = self.data_manager.search_notes(theme, query)
+            # El índice FTS5 devuelve los IDs ya ordenados por relevancia; solo los resolvemos.
+            notes = [note for note in map(get_note, matching_ids) if note is not None]
+            self._finish_search(generation, theme, query, notes, select_last)
+
+    def _narrow_search(self, generation, theme, query, candidates, match, start, matched, select_last):
+        """Filtra SEARCH_CHUNK_SIZE candidatos por llamada y cede el control a Tk entre porciones."""
+        if generation != self._search_generation:
+            return # El usuario ha seguido escribiendo: esta búsqueda ya no interesa.
+        end = start + SEARCH_CHUNK_SIZE
+        matched.extend(note for note in candidates[start:end]
+                       if match(note.get("titulo") or "", note.get("contenido") or ""))
+        if end < len(candidates):
+            self.root.after(1, self._narrow_search, generation, theme, query, candidates, match, end, matched, select_last)
+        else:
+            self._finish_search(generation, theme, query, matched, select_last)
 
-        if select_last and self.listbox_apuntes.size() > 0:
-            self.listbox_apuntes.selection_set(tk.END)
+    def _finish_search(self, generation, theme, query, notes, select_last):
+        if generation != self._search_generation:
+            return
+        self._last_search = (theme, query, [note['id'] for note in notes], self.data_manager.search_version)
+        self._fill_notes_listbox(notes, select_last)
 
     # --- Lógica de la Aplicación (Acciones del Usuario) ---
 
@@ -135,7 +295,8 @@ class Millon_note:
             self._refresh_notes_view()
             return
         self.current_selected_theme = self.listbox_temas.get(self.listbox_temas.curselection()[0])
-        self.search_var.set("")
+        self._ensure_theme_loaded(self.current_selected_theme)
+        self._clear_search_text()
         self._refresh_notes_view()
 
     def add_new_note(self):
@@ -178,9 +339,14 @@ class Millon_note:
             return
 
         if is_image:
-            filepath = filedialog.askopenfilename(title="Selecciona una imagen", filetypes=[("Imágenes", "*.png;*.jpg;*.jpeg;*.gif;*.bmp")])
-            if not filepath: return
-            prompt_title, initial_value = "Título para la imagen:", os.path.basename(filepath)
+            filepaths = filedialog.askopenfilenames(title="Selecciona una o varias imágenes", filetypes=[("Imágenes", "*.png;*.jpg;*.jpeg;*.gif;*.bmp")])
+            if not filepaths: return
+            if len(filepaths) > 1:
+                # Con varias imágenes no se pregunta el título de cada una: se usa su nombre.
+                for filepath in filepaths:
+                    self._import_image(filepath, os.path.basename(filepath))
+                return
+            prompt_title, initial_value = "Título para la imagen:", os.path.basename(filepaths[0])
         else:
             prompt_title, initial_value = "Título del apunte:", ""
 
@@ -189,28 +355,53 @@ class Millon_note:
             return
 
         note_title = note_title_str.strip()
-        new_note_dict = {"titulo": note_title, "anclado": False}
-
         if is_image:
-            try:
-                _, ext = os.path.splitext(filepath)
-                dest_path = os.path.join(self.IMAGE_DIR, f"{int(time.time() * 1000)}{ext}")
-                shutil.copy(filepath, dest_path)
-                new_note_dict.update({"type": "image", "path": dest_path, "pos_x": 120, "pos_y": 120})
-            except (IOError, OSError) as e:
-                messagebox.showerror("Error", f"No se pudo guardar la imagen: {e}")
-                return
-        else:
-            color = ColorPickerDialog(self.root, self.POSTIT_COLORS, self.font_normal).show()
-            if not color: return
-            new_note_dict.update({"type": "text", "contenido": "", "pos_x": 100, "pos_y": 100, "color": color})
+            self._import_image(filepaths[0], note_title)
+            return
+
+        color = ColorPickerDialog(self.root, self.POSTIT_COLORS, self.font_normal).show()
+        if not color: return
+        new_note_dict = {"titulo": note_title, "anclado": False, "type": "text", "contenido": "",
+                         "pos_x": 100, "pos_y": 100, "color": color}
 
         new_id = self.data_manager.add_note(self.current_selected_theme, new_note_dict)
         if new_id:
-            new_note_dict['id'] = new_id
-            self.datos[self.current_selected_theme].append(new_note_dict)
+            self.note_store.add(self.current_selected_theme, Note(new_note_dict, id=new_id))
             self._refresh_notes_view(select_last=True)
 
+    def _import_image(self, filepath, note_title):
+        """
+        Importa una imagen en segundo plano como nueva nota del tema actual.
+
+        Hasta que la imagen está copiada y procesada, la lista muestra una entrada provisional
+        con su título; después se sustituye por la nota real (o desaparece si falló).
+        """
+        placeholder_id = self._next_placeholder_id
+        self._next_placeholder_id -= 1
+        placeholder = Note(id=placeholder_id, titulo=f"{note_title} (importando…)", type="pending")
+        self.pending_imports[placeholder_id] = [self.current_selected_theme, placeholder]
+        self.image_importer.submit(filepath, lambda result, error: self._on_image_imported(placeholder_id, note_title, result, error))
+        self._refresh_notes_view(select_last=True)
+
+    def _on_image_imported(self, placeholder_id, note_title, result, error):
+        """Completa la importación de `_import_image` (en el hilo de Tk)."""
+        theme, _ = self.pending_imports.pop(placeholder_id)
+        try:
+            if error is not None:
+                messagebox.showerror("Error", f"No se pudo guardar la imagen '{note_title}': {error}")
+            elif theme in self.note_store:
+                # Si el tema se borró mientras se importaba, no se crea la nota; el importador
+                # retira entonces la imagen del almacén si ninguna otra nota la usa.
+                dest_path, image_metadata = result
+                new_note_dict = {"titulo": note_title, "anclado": False, "type": "image", "path": dest_path,
+                                 "pos_x": 120, "pos_y": 120, **image_metadata}
+                new_id = self.data_manager.add_note(theme, new_note_dict)
+                if new_id:
+                    self.note_store.add(theme, Note(new_note_dict, id=new_id))
+        finally:
+            if theme == self.current_selected_theme:
+                self._refresh_notes_view()
+
     def delete_note(self):
         """
         Elimina una nota seleccionada.
@@ -226,17 +417,14 @@ class Millon_note:
         if not note_to_delete: return
 
         if messagebox.askyesno("Confirmar", f"¿Eliminar apunte '{note_to_delete['titulo']}'?"):
-            if note_to_delete.get("type") == "image" and note_to_delete.get("path"):
-                try:
-                    if os.path.exists(note_to_delete["path"]): os.remove(note_to_delete["path"])
-                except OSError as e: print(f"Error al eliminar archivo de imagen: {e}")
-
-            sat_id = f"{self.current_selected_theme}_{note_id}"
-            if sat_id in self.open_satellites:
-                self.open_satellites.pop(sat_id).destroy()
+            if note_id in self.open_satellites:
+                self.open_satellites.pop(note_id).destroy()
 
             self.data_manager.delete_note(note_id)
-            self.datos[self.current_selected_theme] = [n for n in self.datos[self.current_selected_theme] if n['id'] != note_id]
+            # La imagen puede estar compartida con otras notas: solo se borra con la última.
+            if note_to_delete.get("type") == "image":
+                self.image_store.release(note_to_delete.get("path"))
+            self.note_store.remove(note_id)
             self._refresh_notes_view()
 
     def rename_note(self):
@@ -264,9 +452,8 @@ class Millon_note:
             self.data_manager.update_note(note_id, note_to_rename)
             self._refresh_notes_view()
 
-            sat_id = f"{self.current_selected_theme}_{note_id}"
-            if sat_id in self.open_satellites and hasattr(self.open_satellites[sat_id], 'title_label'):
-                self.open_satellites[sat_id].title_label.config(text=clean_title)
+            if note_id in self.open_satellites and hasattr(self.open_satellites[note_id], 'title_label'):
+                self.open_satellites[note_id].title_label.config(text=clean_title)
 
     def open_note_editor(self, event=None):
         """
@@ -305,17 +492,16 @@ class Millon_note:
             note_data["contenido"] = text_widget.get("1.0", tk.END).strip()
             self.data_manager.update_note(note_data['id'], note_data)
 
-            sat_id = f"{self.current_selected_theme}_{note_data['id']}"
-            if sat_id in self.open_satellites:
-                self.open_satellites.pop(sat_id).destroy()
-                self._recreate_satellite(self.current_selected_theme, note_data['id'])
+            if note_data['id'] in self.open_satellites:
+                self.open_satellites.pop(note_data['id']).destroy()
+                self._recreate_satellite(note_data['id'])
 
             editor.destroy()
 
         editor.protocol("WM_DELETE_WINDOW", save_and_close)
         tk.ttk.Button(editor, text="Guardar y Cerrar", command=save_and_close, style="Accent.TButton").pack(pady=10)
 
-    def toggle_pin_note(self, event=None, note_id=None, theme=None):
+    def toggle_pin_note(self, event=None, note_id=None):
         """
         Ancla o desancla una nota. Esta función es flexible y está diseñada para
         funcionar en dos escenarios diferentes:
@@ -324,79 +510,58 @@ class Millon_note:
             evento o un botón), opera sobre la nota que está actualmente seleccionada
             en la `listbox` de apuntes.
 
-        2.  Cuando se le pasa un `note_id` y un `theme` (llamada desde el botón '✖'
+        2.  Cuando se le pasa un `note_id` (llamada desde el botón '✖' o el menú
             de una ventana satélite), opera directamente sobre esa nota específica,
             sin importar la selección actual en la UI principal.
         """
 
-        # Determina sobre qué tema se va a operar.
-        theme_to_use = self.current_selected_theme
-
-        # Escenario 2: La llamada viene de un satélite.
-        if note_id is not None and theme is not None:
-            theme_to_use = theme
         # Escenario 1: La llamada viene de la UI principal.
-        else:
+        if note_id is None:
             note_id = self._get_selected_note_id()
 
-        # Comprobación de seguridad: Si no tenemos un ID de nota o un tema válido,
-        # no podemos continuar.
-        if not note_id or not theme_to_use:
-            return
-
         # Buscamos la nota correspondiente en nuestra estructura de datos en memoria.
         # Es crucial operar sobre la versión en RAM para mantener la consistencia de la UI.
-        # Usamos un bucle explícito en lugar de _get_note_by_id para manejar el caso
-        # en que el 'theme_to_use' no sea el 'current_selected_theme'.
-        note_data = None
-        for note in self.datos.get(theme_to_use, []):
-            if note['id'] == note_id:
-                note_data = note
-                break
+        # El índice por ID del NoteStore la encuentra sea cual sea su tema.
+        note_data = self._get_note_by_id(note_id)
 
         # Si, por alguna razón, la nota no se encuentra, abortamos para evitar errores.
         if not note_data:
             return
 
-        # El núcleo de la lógica: invertimos el estado 'anclado' de la nota.
-        # El .get('anclado', False) previene un error si la clave no existiera.
-        note_data["anclado"] = not note_data.get("anclado", False)
+        # El núcleo de la lógica: invertimos el estado 'anclado' de la nota
+        # (a través del NoteStore, que mantiene el índice de notas ancladas).
+        self.note_store.set_pinned(note_id, not note_data.get("anclado", False))
 
         # Persistimos el cambio en la base de datos. Esta es la operación crítica.
-        # Le pasamos el ID y el diccionario de la nota completo y actualizado.
         self.data_manager.update_note(note_id, note_data)
 
         # Finalmente, le decimos a la lógica de la UI que muestre u oculte la ventana
         # satélite según el nuevo estado de 'anclado'.
-        self._handle_satellite_toggle(theme_to_use, note_id, note_data["anclado"])
+        self._handle_satellite_toggle(note_id, note_data["anclado"])
 
-    def _handle_satellite_toggle(self, theme, note_id, should_be_pinned):
+    def _handle_satellite_toggle(self, note_id, should_be_pinned):
         """
         Maneja el toggle de una nota satélite. Si should_be_pinned es True, intenta abrir la nota
         satélite si no lo está ya. Si es False, intenta cerrar la ventana satélite si
-        existe. El parámetro 'theme' es el nombre del tema al que pertenece la nota.
-        El parámetro 'note_id' es el ID único de la nota.
+        existe. El parámetro 'note_id' es el ID único de la nota.
         """
-        sat_id = f"{theme}_{note_id}"
         if should_be_pinned:
-            if sat_id not in self.open_satellites:
-                self._recreate_satellite(theme, note_id)
-        elif sat_id in self.open_satellites:
-            self.open_satellites.pop(sat_id).destroy()
+            if note_id not in self.open_satellites:
+                self._recreate_satellite(note_id)
+        elif note_id in self.open_satellites:
+            self.open_satellites.pop(note_id).destroy()
 
-    def _recreate_satellite(self, theme, note_id):
+    def _recreate_satellite(self, note_id):
 
         """
         Vuelve a crear una ventana satélite para una nota después de que ha cambiado
         su estado de 'anclado'.
 
-        :param theme: El tema al que pertenece la nota.
         :param note_id: El ID de la nota que se va a recrear.
         :return: None
         """
-        note_index = next((i for i, note in enumerate(self.datos[theme]) if note['id'] == note_id), None)
-        if note_index is not None:
-            self.satellite_manager.create_satellite_window(theme, note_index)
+        if self.note_store.get(note_id) is not None:
+            self.satellite_manager.create_satellite_window(note_id)
 
     def add_new_theme(self):
         """Abre un diálogo para solicitar el nombre de un nuevo tema.
@@ -405,10 +570,10 @@ class Millon_note:
         name = CustomInputDialog(self.root, "Nuevo Tema", "Nombre del nuevo tema:", font_normal=self.font_normal).show()
         if name and name.strip():
             clean_name = name.strip()
-            if clean_name in self.datos:
+            if clean_name in self.note_store:
                 messagebox.showwarning("Atención", f"El tema '{clean_name}' ya existe.")
             elif self.data_manager.add_theme(clean_name):
-                self.datos[clean_name] = []
+                self.note_store.add_theme(clean_name)
                 self.populate_themes_list()
                 for i, item in enumerate(self.listbox_temas.get(0, tk.END)):
                     if item == clean_name:
@@ -435,12 +600,15 @@ class Millon_note:
 
         if new_name_str and new_name_str.strip() and new_name_str.strip() != old_name:
             clean_name = new_name_str.strip()
-            if clean_name in self.datos:
+            if clean_name in self.note_store:
                 messagebox.showwarning("Atención", f"El tema '{clean_name}' ya existe.")
                 return
 
             self.data_manager.rename_theme(old_name, clean_name)
-            self.datos[clean_name] = self.datos.pop(old_name)
+            self.note_store.rename_theme(old_name, clean_name)
+            for pending in self.pending_imports.values():
+                if pending[0] == old_name:
+                    pending[0] = clean_name
             self.current_selected_theme = clean_name
             self.populate_themes_list()
 
@@ -455,15 +623,13 @@ class Millon_note:
             messagebox.showwarning("Atención", "Selecciona un tema para eliminar.")
             return
         if messagebox.askyesno("Confirmar", f"¿Eliminar '{self.current_selected_theme}' y todas sus notas? Esta acción es irreversible."):
-            notes_to_delete = self.datos.get(self.current_selected_theme, [])
-            for note in notes_to_delete:
-                if note.get("type") == "image" and note.get("path"):
-                    try:
-                        if os.path.exists(note["path"]): os.remove(note["path"])
-                    except OSError as e: print(f"Error al eliminar archivo de imagen: {e}")
-
             self.data_manager.delete_theme(self.current_selected_theme)
-            del self.datos[self.current_selected_theme]
+            notes_deleted = self.note_store.remove_theme(self.current_selected_theme)
+            for note in notes_deleted:
+                if note['id'] in self.open_satellites:
+                    self.open_satellites.pop(note['id']).destroy()
+            for path in {note.get("path") for note in notes_deleted if note.get("type") == "image"}:
+                self.image_store.release(path)
             self.current_selected_theme = None
             self.populate_themes_list()
             self._refresh_notes_view()
@@ -476,7 +642,7 @@ class Millon_note:
         """
         current_selection = self.current_selected_theme
         self.listbox_temas.delete(0, tk.END)
-        sorted_themes = sorted(self.datos.keys())
+        sorted_themes = sorted(self.note_store.themes())
         for i, tema in enumerate(sorted_themes):
             self.listbox_temas.insert(tk.END, tema)
             if tema == current_selection:
@@ -501,17 +667,12 @@ class Millon_note:
         """
         Toggle the theme of the application between light and dark.
 
-        This function also re-renders all open satellites with the new theme.
+        Open satellites are left as they are: their colors come from each note,
+        not from the application theme, so there is nothing to re-render.
         """
         self.current_theme = "light" if self.current_theme == "dark" else "dark"
         sv_ttk.set_theme(self.current_theme)
         self.style_listboxes()
-        for sat_id, sat_window in list(self.open_satellites.items()):
-            theme, note_id_str = sat_id.split('_', 1)
-            note_id = int(note_id_str)
-            sat_window.destroy()
-            self.open_satellites.pop(sat_id)
-            self._recreate_satellite(theme, note_id)
 
     def style_listboxes(self):
         """
@@ -527,5 +688,5 @@ class Millon_note:
         Limpia la barra de búsqueda y vuelve a mostrar todas las notas
         en la lista de apuntes.
         """
-        self.search_var.set("")
+        self._clear_search_text()
         self._refresh_notes_view()
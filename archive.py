@@ -0,0 +1,159 @@
+# archive.py
+# Copia de seguridad y traslado de colecciones: exporta temas, notas e imágenes a un único
+# archivo .zip y lo vuelve a importar.
+#
+# Contenido del archivo:
+#   manifest.json -> versión del formato, fecha y temas incluidos
+#   notes.jsonl   -> una nota por línea: {"theme": ..., "note": {...}} (formato de la app)
+#   images/...    -> cada imagen referenciada, una sola vez (sin derivados: se regeneran)
+#
+# Todo se procesa en streaming: las notas se escriben y leen línea a línea y las imágenes
+# por bloques, así que el tamaño de la colección no limita la memoria.
+#
+# Uso: python archive.py export copia.zip [--theme NOMBRE ...] [--db Millon_note.db]
+#      python archive.py import copia.zip [--db Millon_note.db]
+import argparse
+import io
+import json
+import os
+import time
+import zipfile
+
+from config import DATA_FILE, IMAGE_DIR, IMAGE_DERIVATIVE_SIZES, IMAGE_STORE_HARDLINKS
+
+FORMAT_VERSION = 1
+# Campos de la nota que se guardan. El ID no: al importar cada nota recibe uno nuevo.
+_EXPORTED_FIELDS = ("titulo", "type", "contenido", "anclado", "pos_x", "pos_y", "color", "width",
+                    "img_width", "img_height", "aspect")
+
+
+def export_archive(data_manager, archive_path, theme_names=None, progress=None):
+    """
+    Exporta los temas indicados (todos si es None) con sus notas e imágenes a `archive_path`.
+
+    Las notas salen de DataManager.iter_notes. Con el modo de alto rendimiento (WAL) se leen
+    en una única transacción y el archivo refleja un instante coherente aunque la app siga
+    guardando cambios; sin él se leen por bloques para no bloquear los commits de la app.
+
+    :param progress: `progress(notas_exportadas)` cada 1000 notas, opcional.
+    :return: Número de notas exportadas.
+    """
+    themes, images = [], {} # images: ruta en disco -> nombre dentro del zip
+    exported = 0
+    with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        with archive.open("notes.jsonl", "w") as raw, io.TextIOWrapper(raw, encoding="utf-8") as notes_file:
+            for theme, note in data_manager.iter_notes(theme_names):
+                if not themes or themes[-1] != theme:
+                    themes.append(theme)
+                if note is None:
+                    continue
+                record = {field: note.get(field) for field in _EXPORTED_FIELDS}
+                path = note.get("path")
+                if path:
+                    if path not in images:
+                        images[path] = f"images/{len(images)}_{os.path.basename(path)}"
+                    record["image"] = images[path]
+                notes_file.write(json.dumps({"theme": theme, "note": record}, ensure_ascii=False) + "\n")
+                exported += 1
+                if progress and exported % 1000 == 0: progress(exported)
+
+        for path, name in images.items():
+            if os.path.exists(path):
+                # Las imágenes ya vienen comprimidas: se guardan tal cual.
+                archive.write(path, name, compress_type=zipfile.ZIP_STORED)
+            else:
+                print(f"Imagen no encontrada, se omite: {path}")
+
+        manifest = {"format": FORMAT_VERSION, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "themes": themes, "notes": exported}
+        archive.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+    return exported
+
+
+def import_archive(data_manager, image_store, archive_path, chunk_size=2000, progress=None):
+    """
+    Importa un archivo creado por export_archive. Los temas con el mismo nombre que uno
+    existente se completan con las notas importadas.
+
+    Las imágenes pasan por el ImageStore (deduplicadas por contenido, con sus derivados) y
+    las notas se insertan con executemany en transacciones de `chunk_size` notas.
+
+    :param progress: `progress(notas_importadas, notas_totales)` tras cada bloque, opcional.
+    :return: Número de notas importadas.
+    """
+    with zipfile.ZipFile(archive_path) as archive:
+        manifest = json.loads(archive.read("manifest.json"))
+        if manifest.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Formato de archivo no compatible: {manifest.get('format')}")
+
+        image_paths = {} # nombre dentro del zip -> (ruta en el almacén, metadatos)
+        for name in archive.namelist():
+            if name.startswith("images/") and not name.endswith("/"):
+                with archive.open(name) as stream:
+                    image_paths[name] = image_store.import_stream(stream, os.path.splitext(name)[1])
+
+        theme_ids = {}
+
+        def write_chunk(themes, notes):
+            def job(conn):
+                for theme in themes:
+                    conn.execute("INSERT OR IGNORE INTO themes (name) VALUES (?)", (theme,))
+                    theme_ids[theme] = conn.execute("SELECT id FROM themes WHERE name = ?", (theme,)).fetchone()[0]
+                conn.executemany(data_manager.INSERT_NOTE_SQL,
+                                 [data_manager.note_insert_params(theme_ids[theme], note) for theme, note in notes])
+                conn.commit()
+            data_manager.write(job)
+
+        # Los temas vacíos solo aparecen en el manifiesto: se crean con el primer bloque.
+        pending_themes, pending_notes = list(manifest.get("themes", [])), []
+        imported = 0
+        with archive.open("notes.jsonl") as raw:
+            for line in io.TextIOWrapper(raw, encoding="utf-8"):
+                entry = json.loads(line)
+                note = entry["note"]
+                image = note.pop("image", None)
+                if image is not None and image in image_paths:
+                    note["path"], metadata = image_paths[image]
+                    note.update(metadata)
+                pending_notes.append((entry["theme"], note))
+                if entry["theme"] not in theme_ids and entry["theme"] not in pending_themes:
+                    pending_themes.append(entry["theme"])
+                if len(pending_notes) >= chunk_size:
+                    write_chunk(pending_themes, pending_notes)
+                    imported += len(pending_notes)
+                    pending_themes, pending_notes = [], []
+                    if progress: progress(imported, manifest.get("notes"))
+        write_chunk(pending_themes, pending_notes)
+        imported += len(pending_notes)
+        if progress: progress(imported, manifest.get("notes"))
+    return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta o importa colecciones de Nexus Notes en un archivo .zip.")
+    parser.add_argument("action", choices=("export", "import"))
+    parser.add_argument("archive", help="Archivo .zip.")
+    parser.add_argument("--theme", action="append", dest="themes", help="Tema a exportar (se puede repetir; por defecto, todos).")
+    parser.add_argument("--db", default=DATA_FILE, help="Base de datos.")
+    args = parser.parse_args()
+
+    from data_manager import DataManager
+    from image_store import ImageStore
+    manager = DataManager(args.db)
+    start = time.perf_counter()
+    try:
+        if args.action == "export":
+            count = export_archive(manager, args.archive, args.themes)
+            print(f"{count} notas exportadas a {args.archive} en {time.perf_counter() - start:.1f} s.")
+        else:
+            os.makedirs(IMAGE_DIR, exist_ok=True)
+            store = ImageStore(IMAGE_DIR, manager, IMAGE_DERIVATIVE_SIZES, allow_hardlinks=IMAGE_STORE_HARDLINKS)
+            count = import_archive(manager, store, args.archive,
+                                   progress=lambda done, total: print(f"\r  {done}/{total} notas", end="", flush=True))
+            print(f"\n{count} notas importadas en {time.perf_counter() - start:.1f} s.")
+    finally:
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# background_cache.py
+# Caché compartida de los fondos redondeados de los satélites de texto.
+# Solo hay unos pocos colores de post-it y un único tamaño, así que todas las notas del mismo
+# color pueden mostrar el mismo PhotoImage en lugar de dibujar y convertir uno propio.
+from collections import OrderedDict
+
+
+class BackgroundImageCache:
+    """
+    PhotoImages compartidos con conteo de referencias.
+
+    Cada satélite que muestra un fondo lo adquiere con acquire() y lo libera con release()
+    al destruirse. Mientras alguien lo usa, el PhotoImage se mantiene vivo (Tk lo borraría si
+    Python recolectara el objeto). Los fondos sin usuarios se conservan en un LRU de hasta
+    `max_idle` entradas, para que recrear satélites en masa los reutilice.
+    """
+    def __init__(self, factory, max_idle=16):
+        """
+        Parameters
+        ----------
+        factory : callable
+            `factory(width, height, radius, color)` -> PhotoImage, llamado solo en los fallos.
+        max_idle : int
+            Fondos sin referencias que se conservan.
+        """
+        self.factory = factory
+        self.max_idle = max_idle
+        self._images = {}          # clave -> PhotoImage
+        self._refcounts = {}       # clave -> número de satélites que lo usan
+        self._idle = OrderedDict() # claves sin usuarios, de más antigua a más reciente
+
+    def acquire(self, width, height, radius, color, scale=1.0):
+        """Devuelve (clave, PhotoImage) del fondo pedido, creándolo solo si no existe."""
+        key = (width, height, radius, color, round(scale, 3))
+        if key not in self._images:
+            self._images[key] = self.factory(width, height, radius, color)
+            self._refcounts[key] = 0
+        self._idle.pop(key, None)
+        self._refcounts[key] += 1
+        return key, self._images[key]
+
+    def release(self, key):
+        """Suelta una referencia. El fondo pasa al LRU de inactivos al quedarse sin usuarios."""
+        if key not in self._refcounts:
+            return
+        self._refcounts[key] -= 1
+        if self._refcounts[key] > 0:
+            return
+        self._idle[key] = True
+        while len(self._idle) > self.max_idle:
+            old_key, _ = self._idle.popitem(last=False)
+            del self._images[old_key]
+            del self._refcounts[old_key]
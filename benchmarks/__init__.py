@@ -0,0 +1,3 @@
+# benchmarks
+# Mediciones de rendimiento de Nexus Notes. Cada módulo se ejecuta desde la raíz del repositorio,
+# por ejemplo: python -m benchmarks.bench_formula_render
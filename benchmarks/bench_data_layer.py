@@ -0,0 +1,153 @@
+# benchmarks/bench_data_layer.py
+# Benchmark de la capa de datos, sin pantalla: genera una base de datos sintética por tamaño
+# (benchmarks.corpus) y mide las operaciones de DataManager sobre ella.
+#   load_data     -> carga completa de temas y notas
+#   add_note      -> inserciones de notas sueltas (ms por nota)
+#   update_note   -> cambios de posición, como al arrastrar un satélite (ms por nota)
+#   search        -> búsquedas en un tema (ms por consulta)
+#   narrowing     -> comprueba que acotar en memoria (búsqueda al escribir) da lo mismo que buscar
+#   delete_theme  -> borrado de un tema con todas sus notas
+# Los resultados se escriben en JSON para comparar cambios de almacenamiento entre ejecuciones.
+#
+# Uso: python -m benchmarks.bench_data_layer [--sizes 10000 100000 1000000] [--ops 1000]
+#                                             [--write-behind-ms 250] [--performance-mode]
+#                                             [--workdir carpeta] [--json salida.json]
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import generate_corpus
+from config import DB_PRAGMAS
+from data_manager import DataManager
+
+QUERIES = ("ecuación", "integral de", "teo", "campo fuerza", "ejerc")
+# Consultas escritas letra a letra para la comprobación del acotado; incluyen fórmulas con "_".
+NARROWING_QUERIES = ("ecuación", "campo fuerza", "int_0", "sum_n", "alpha + beta")
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def check_narrowing(manager, store, theme, queries):
+    """
+    Repite lo que hace la app al escribir una consulta letra a letra: cada resultado se acota
+    en memoria con note_matcher a partir del anterior. Devuelve las consultas cuyo resultado
+    acotado no coincide con una búsqueda nueva en la base de datos.
+    """
+    mismatches = []
+    for query in queries:
+        previous, previous_ids = "", []
+        for end in range(1, len(query) + 1):
+            prefix = query[:end]
+            expected = manager.search_notes(theme, prefix)
+            if re.search(r"[^\W_]", previous): # Mismo criterio que Millon_note._start_search.
+                match = manager.note_matcher(prefix)
+                notes = [store.get(note_id) for note_id in previous_ids]
+                narrowed = {note['id'] for note in notes if match(note.get("titulo") or "", note.get("contenido") or "")}
+                if narrowed != set(expected):
+                    mismatches.append(prefix)
+            previous, previous_ids = prefix, expected
+    return mismatches
+
+
+def run_size(db_file, args):
+    """Mide todas las operaciones sobre una copia recién generada de la base de datos."""
+    options = {"write_behind_ms": args.write_behind_ms}
+    if args.performance_mode:
+        options.update(pragmas=DB_PRAGMAS, background_writer=True)
+    results = {}
+    rng = random.Random(0)
+
+    manager = DataManager(db_file, **options)
+    results["load_data_ms"], (store, _) = _timed(manager.load_data)
+    themes = store.themes()
+    note_ids = [note['id'] for theme in themes for note in store.notes(theme)]
+
+    def add_notes():
+        for index in range(args.ops):
+            manager.add_note(themes[index % len(themes)], {"titulo": f"Nuevo {index}", "type": "text",
+                                                             "contenido": "texto de prueba", "pos_x": 0, "pos_y": 0})
+        manager.flush(wait=True)
+    elapsed, _ = _timed(add_notes)
+    results["add_note_ms_per_op"] = elapsed / args.ops
+
+    def update_notes():
+        for note_id in rng.sample(note_ids, min(args.ops, len(note_ids))):
+            note = store.get(note_id)
+            note.update({"pos_x": rng.randrange(1600), "pos_y": rng.randrange(900)})
+            manager.update_note(note_id, note)
+        manager.flush(wait=True)
+    elapsed, _ = _timed(update_notes)
+    results["update_note_ms_per_op"] = elapsed / min(args.ops, len(note_ids))
+
+    timings = []
+    for query in QUERIES:
+        elapsed, _ = _timed(lambda: manager.search_notes(themes[0], query))
+        timings.append(elapsed)
+    results["search_ms_per_query"] = sum(timings) / len(timings)
+    results["narrowing_mismatches"] = check_narrowing(manager, store, themes[0], NARROWING_QUERIES)
+
+    results["delete_theme_ms"], _ = _timed(lambda: manager.delete_theme(themes[-1]))
+    results["notes_per_theme"] = len(note_ids) // len(themes)
+    manager.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide la capa de datos de Nexus Notes sin interfaz gráfica.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000], help="Número de notas.")
+    parser.add_argument("--themes", type=int, default=50, help="Temas por base de datos.")
+    parser.add_argument("--ops", type=int, default=1000, help="Operaciones en add_note y update_note.")
+    parser.add_argument("--write-behind-ms", type=int, default=None, help="Activa la escritura diferida.")
+    parser.add_argument("--performance-mode", action="store_true", help="PRAGMAs de DB_PRAGMAS e hilo escritor.")
+    parser.add_argument("--workdir", default=None, help="Carpeta para las bases de datos (se reutilizan si existen).")
+    parser.add_argument("--json", default=None, help="Escribe los resultados en este archivo JSON.")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="nexus_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    results = {
+        "environment": {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                        "platform": platform.platform()},
+        "options": {"themes": args.themes, "ops": args.ops, "write_behind_ms": args.write_behind_ms,
+                    "performance_mode": args.performance_mode},
+        "sizes": {},
+    }
+    for size in args.sizes:
+        corpus_file = os.path.join(workdir, f"corpus_{size}_{args.themes}.db")
+        if not os.path.exists(corpus_file):
+            print(f"Generando {corpus_file}...")
+            generate_corpus(corpus_file, size, themes=args.themes)
+        # Cada medición trabaja sobre una copia: add/update/delete modifican la base de datos.
+        run_file = os.path.join(workdir, f"run_{size}.db")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(run_file + suffix): os.remove(run_file + suffix)
+        with sqlite3.connect(corpus_file) as source, sqlite3.connect(run_file) as dest:
+            source.backup(dest)
+        results["sizes"][size] = run_size(run_file, args)
+
+    print(f"\n  {'notas':>9} {'load_data':>11} {'add_note':>10} {'update':>10} {'search':>10} {'del_theme':>11}")
+    for size, r in results["sizes"].items():
+        print(f"  {size:>9} {r['load_data_ms']:9.1f}ms {r['add_note_ms_per_op']:8.3f}ms {r['update_note_ms_per_op']:8.3f}ms"
+              f" {r['search_ms_per_query']:8.2f}ms {r['delete_theme_ms']:9.1f}ms")
+        if r['narrowing_mismatches']:
+            print(f"  {'':>9} el acotado en memoria no coincide con la búsqueda en: {r['narrowing_mismatches']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if any(r['narrowing_mismatches'] for r in results["sizes"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
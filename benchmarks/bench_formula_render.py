@@ -0,0 +1,62 @@
+# benchmarks/bench_formula_render.py
+# Micro-benchmark del coste por fórmula: figura de pyplot + savefig (método anterior)
+# frente al renderizador mathtext directo de formula_renderer.
+#
+# Uso: python -m benchmarks.bench_formula_render [--repeat N]
+import argparse
+import io
+import time
+
+import matplotlib
+matplotlib.use("Agg") # Sin pantalla: el benchmark no necesita Tk.
+import matplotlib.pyplot as plt
+from PIL import Image
+
+from formula_renderer import render_formula, render_formulas
+
+FORMULAS = [
+    r"$x^2$",
+    r"$\frac{a}{b}$",
+    r"$\int_0^\infty e^{-x^2}\,dx = \frac{\sqrt{\pi}}{2}$",
+    r"$\sum_{n=1}^{\infty} \frac{1}{n^2} = \frac{\pi^2}{6}$",
+    r"$\nabla \cdot \vec{E} = \frac{\rho}{\varepsilon_0}$",
+    r"$\alpha + \beta = \gamma$",
+]
+
+
+def render_with_pyplot(formula, color="#000000", dpi=150, fontsize=12):
+    """Réplica del renderizado original de SatelliteManager, como referencia."""
+    fig = plt.figure(dpi=dpi); fig.text(0, 0, formula, fontsize=fontsize, color=color)
+    buf = io.BytesIO(); fig.savefig(buf, format='png', transparent=True, bbox_inches='tight', pad_inches=0.1); plt.close(fig); buf.seek(0)
+    image = Image.open(buf); image.load()
+    return image
+
+
+def time_per_formula(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / (repeat * len(FORMULAS)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20, help="Repeticiones de la lista de fórmulas.")
+    args = parser.parse_args()
+
+    # Calentamiento: carga de fuentes y creación del parser no cuentan.
+    render_with_pyplot(FORMULAS[0]); render_formula(FORMULAS[0])
+
+    results = {
+        "pyplot + savefig": time_per_formula(lambda: [render_with_pyplot(f) for f in FORMULAS], args.repeat),
+        "mathtext directo": time_per_formula(lambda: [render_formula(f) for f in FORMULAS], args.repeat),
+        "mathtext por lotes": time_per_formula(lambda: render_formulas(FORMULAS), args.repeat),
+    }
+    baseline = results["pyplot + savefig"]
+    print(f"{len(FORMULAS)} fórmulas x {args.repeat} repeticiones")
+    for name, ms in results.items():
+        print(f"  {name:<20} {ms:8.3f} ms/fórmula   (x{baseline / ms:.1f})")
+
+
+if __name__ == "__main__":
+    main()
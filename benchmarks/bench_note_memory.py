@@ -0,0 +1,77 @@
+# benchmarks/bench_note_memory.py
+# Memoria ocupada por las notas cargadas: un diccionario por nota (formato anterior de
+# load_data) frente al registro compacto note_store.Note.
+# Se mide con tracemalloc la memoria asignada al construir N notas con el mismo contenido
+# que produce una carga real (títulos y textos distintos por nota, tipos y colores repetidos).
+#
+# Uso: python -m benchmarks.bench_note_memory [--counts 100000 1000000] [--json salida.json]
+import argparse
+import gc
+import json
+import tracemalloc
+
+from data_manager import DataManager
+
+COLORS = ("#FFFFA5", "#FFD1DC", "#AEC6CF", "#C1E1C1", "#FFDAB9", "#E6E6FA")
+
+
+def make_rows(count):
+    """Filas con la forma de DataManager._NOTE_COLUMNS. Las cadenas se crean una por fila,
+    como las devuelve sqlite3."""
+    for note_id in range(1, count + 1):
+        is_image = note_id % 10 == 0
+        yield (
+            note_id, f"Apunte {note_id}", "".join("image") if is_image else "".join("text"),
+            None if is_image else f"Contenido de la nota {note_id}",
+            f"MNI/{note_id:064x}.png" if is_image else None, note_id % 50 == 0,
+            100 + note_id % 800, 100 + note_id % 600, None if is_image else "".join(COLORS[note_id % len(COLORS)]),
+            300 if is_image else None, 1920 if is_image else None, 1080 if is_image else None, 0.5625 if is_image else None,
+        )
+
+
+def note_as_dict(row):
+    """Réplica del diccionario que construía load_data antes del registro compacto."""
+    return {
+        "id": row[0], "titulo": row[1], "type": row[2], "contenido": row[3], "path": row[4],
+        "anclado": bool(row[5]), "pos_x": row[6], "pos_y": row[7], "color": row[8], "width": row[9],
+        "img_width": row[10], "img_height": row[11], "aspect": row[12]
+    }
+
+
+def measure(build, count):
+    """Bytes asignados por `build` para `count` notas (incluye sus cadenas)."""
+    gc.collect()
+    tracemalloc.start()
+    notes = [build(row) for row in make_rows(count)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del notes
+    gc.collect()
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara la memoria de las notas como dict y como Note.")
+    parser.add_argument("--counts", type=int, nargs="+", default=[100_000, 1_000_000], help="Número de notas.")
+    parser.add_argument("--json", default=None, help="Escribe los resultados en este archivo JSON.")
+    args = parser.parse_args()
+
+    representations = {"dict": note_as_dict, "Note": DataManager._note_from_row}
+    results = {}
+    print(f"  {'notas':>9} {'formato':<6} {'total':>10} {'por nota':>10}")
+    for count in args.counts:
+        results[count] = {}
+        for name, build in representations.items():
+            total = measure(build, count)
+            results[count][name] = {"bytes": total, "bytes_per_note": round(total / count, 1)}
+            print(f"  {count:>9} {name:<6} {total / 2**20:8.1f} MiB {total / count:8.1f} B")
+        saving = 1 - results[count]["Note"]["bytes"] / results[count]["dict"]["bytes"]
+        print(f"  {'':>9} ahorro: {saving:.0%}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
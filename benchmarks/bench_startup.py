@@ -0,0 +1,64 @@
+# benchmarks/bench_startup.py
+# Presupuesto de arranque en frío: mide por separado cada fase hasta la primera ventana.
+#   import     -> importar app_logic (y todo lo que arrastra)
+#   load_data  -> abrir la base de datos y cargar temas y notas
+#   ui_build   -> construir la ventana principal y seleccionar el primer tema
+#   satellites -> restaurar los satélites de las notas ancladas
+#   first_frame-> procesar los eventos pendientes hasta pintar la primera ventana
+# Necesita pantalla (es la app real). Sale con código 1 si se supera el presupuesto.
+#
+# Uso: python -m benchmarks.bench_startup [--db Millon_note.db] [--budget-ms 1500] [--json salida.json]
+import argparse
+import json
+import sys
+import time
+
+# Módulos pesados que no deberían cargarse en el arranque si no hacen falta.
+HEAVY_MODULES = ("PIL", "matplotlib", "numpy")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide el tiempo de arranque de Nexus Notes por fases.")
+    parser.add_argument("--db", default=None, help="Base de datos a abrir (por defecto, la de config.py).")
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="Presupuesto total hasta la primera ventana.")
+    parser.add_argument("--json", default=None, help="Escribe los resultados en este archivo JSON.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    import tkinter as tk
+    import app_logic
+    import_seconds = time.perf_counter() - start
+    heavy_after_import = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    root = tk.Tk()
+    app = app_logic.Millon_note(root, db_file=args.db or app_logic.DATA_FILE)
+    frame_start = time.perf_counter()
+    root.update()
+    first_frame_seconds = time.perf_counter() - frame_start
+
+    phases = {"import": import_seconds, **app.startup_timings, "first_frame": first_frame_seconds}
+    total_ms = sum(phases.values()) * 1000
+    results = {
+        "phases_ms": {name: round(seconds * 1000, 2) for name, seconds in phases.items()},
+        "total_ms": round(total_ms, 2),
+        "budget_ms": args.budget_ms,
+        "heavy_modules_after_import": heavy_after_import,
+        "heavy_modules_after_startup": [name for name in HEAVY_MODULES if name in sys.modules],
+    }
+    app.on_close()
+
+    for name, ms in results["phases_ms"].items():
+        print(f"  {name:<12} {ms:9.2f} ms")
+    print(f"  {'total':<12} {total_ms:9.2f} ms  (presupuesto {args.budget_ms:.0f} ms)")
+    print(f"  módulos pesados tras importar: {', '.join(heavy_after_import) or 'ninguno'}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if total_ms > args.budget_ms:
+        print("Presupuesto de arranque superado.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# benchmarks/corpus.py
+# Generador de bases de datos sintéticas con el esquema de DataManager, para medir la capa de
+# datos con colecciones de cualquier tamaño sin tener que crearlas a mano.
+#
+# Uso: python -m benchmarks.corpus salida.db --notes 100000 [--themes 50] [--content-size 400]
+#                                           [--formula-density 0.2] [--pinned-ratio 0.001] [--seed 0]
+import argparse
+import os
+import random
+import time
+
+from data_manager import DataManager
+
+WORDS = ("apunte", "ecuación", "derivada", "integral", "matriz", "vector", "función", "límite", "serie",
+         "teorema", "demostración", "ejemplo", "ejercicio", "resumen", "clase", "examen", "fórmula",
+         "energía", "fuerza", "campo", "onda", "probabilidad", "variable", "conjunto", "grupo")
+FORMULAS = (r"$x^2$", r"$\frac{a}{b}$", r"$\int_0^1 f(x)\,dx$", r"$\sum_{n=1}^{N} n$", r"$\alpha + \beta$")
+COLORS = ("#FFFFA5", "#FFD1DC", "#AEC6CF", "#C1E1C1", "#FFDAB9", "#E6E6FA")
+_BATCH_SIZE = 10_000
+
+
+def _content(rng, size, formula_density):
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    if rng.random() < formula_density:
+        words.insert(rng.randrange(len(words) + 1), rng.choice(FORMULAS))
+    return " ".join(words)
+
+
+def generate_corpus(db_file, notes, themes=50, content_size=400, formula_density=0.2, pinned_ratio=0.001, seed=0):
+    """
+    Crea `db_file` (que no debe existir) con `themes` temas y `notes` notas de texto.
+
+    Parameters
+    ----------
+    db_file : str
+        Ruta de la base de datos a crear.
+    notes : int
+        Número total de notas, repartidas por igual entre los temas.
+    themes : int
+        Número de temas.
+    content_size : int
+        Longitud aproximada del contenido de cada nota, en caracteres.
+    formula_density : float
+        Fracción de notas que contienen una fórmula $...$.
+    pinned_ratio : float
+        Fracción de notas ancladas (con satélite).
+    seed : int
+        Semilla: la misma configuración genera siempre la misma base de datos.
+
+    Returns
+    -------
+    float
+        Segundos empleados.
+    """
+    if os.path.exists(db_file):
+        raise FileExistsError(db_file)
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    manager = DataManager(db_file) # Crea el esquema (tablas, índices, FTS y triggers).
+    conn = manager.conn
+    conn.execute("DELETE FROM themes") # Sin los datos de bienvenida (sus notas caen en cascada).
+    theme_ids = []
+    for index in range(themes):
+        theme_ids.append(conn.execute("INSERT INTO themes (name) VALUES (?)", (f"Tema {index:04d}",)).lastrowid)
+
+    batch = []
+    for index in range(notes):
+        batch.append((
+            theme_ids[index % themes], f"Apunte {index}", "text", _content(rng, content_size, formula_density),
+            rng.random() < pinned_ratio, rng.randrange(0, 1600), rng.randrange(0, 900), rng.choice(COLORS)
+        ))
+        if len(batch) >= _BATCH_SIZE or index == notes - 1:
+            conn.executemany('''
+                INSERT INTO notes (theme_id, title, type, content, pinned, pos_x, pos_y, color)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', batch)
+            batch.clear()
+    conn.commit()
+    manager.close()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera una base de datos sintética de Nexus Notes.")
+    parser.add_argument("db_file", help="Base de datos a crear.")
+    parser.add_argument("--notes", type=int, default=10_000, help="Número total de notas.")
+    parser.add_argument("--themes", type=int, default=50, help="Número de temas.")
+    parser.add_argument("--content-size", type=int, default=400, help="Caracteres aproximados por nota.")
+    parser.add_argument("--formula-density", type=float, default=0.2, help="Fracción de notas con fórmulas.")
+    parser.add_argument("--pinned-ratio", type=float, default=0.001, help="Fracción de notas ancladas.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    seconds = generate_corpus(args.db_file, args.notes, args.themes, args.content_size,
+                              args.formula_density, args.pinned_ratio, args.seed)
+    print(f"{args.db_file}: {args.themes} temas y {args.notes} notas en {seconds:.1f} s.")
+
+
+if __name__ == "__main__":
+    main()
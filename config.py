@@ -4,7 +4,47 @@
 
 # --- Rutas y Archivos ---
 DATA_FILE = "Millon_note.db"
+# Formato anterior (un único JSON con app_data/app_settings). Se migra con legacy_import.py.
+LEGACY_DATA_FILE = "nexus_notes_data.json"
 IMAGE_DIR = "MNI"
+# Anchos (px) de las copias reducidas que se generan al importar cada imagen.
+IMAGE_DERIVATIVE_SIZES = (256, 512, 1024)
+# Las imágenes se guardan una sola vez por contenido. Se copian con reflink si el sistema de
+# archivos lo admite; los enlaces duros son aún más baratos pero comparten el archivo con el
+# original del usuario (si lo edita, la nota cambia), así que hay que activarlos a propósito.
+IMAGE_STORE_HARDLINKS = False
+# Hilos que importan imágenes en segundo plano (copia, validación, derivados y metadatos).
+IMAGE_IMPORT_WORKERS = 4
+# Caché en disco de las fórmulas LaTeX ya renderizadas (junto a la carpeta de imágenes).
+FORMULA_CACHE_DIR = "MNI_formulas"
+
+# --- Carga de Datos ---
+# Si es True, al arrancar solo se cargan las notas ancladas; el resto de cada tema
+# se lee de la base de datos la primera vez que se selecciona. Útil con colecciones enormes.
+LAZY_LOAD_THEMES = False
+
+# --- Búsqueda ---
+# La búsqueda se lanza mientras se escribe, tras esta pausa sin pulsaciones (en ms).
+SEARCH_DEBOUNCE_MS = 200
+# Al acotar un resultado anterior en memoria, notas revisadas por fotograma.
+SEARCH_CHUNK_SIZE = 2000
+
+# --- Escritura en la Base de Datos ---
+# Modo write-behind (opcional): las modificaciones de notas (mover un satélite, renombrar,
+# guardar el editor...) se agrupan y se confirman juntas cada WRITE_BEHIND_MS milisegundos,
+# y siempre al cerrar la app. Con None (por defecto) cada operación hace su propio commit.
+WRITE_BEHIND_MS = None
+
+# Modo de alto rendimiento (opcional): journal WAL con los PRAGMAs de abajo y un hilo
+# escritor dedicado, para que ningún commit bloquee la interfaz esperando al disco.
+DB_PERFORMANCE_MODE = False
+DB_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",          # Con WAL es seguro ante cierres inesperados de la app.
+    "mmap_size": 256 * 1024 * 1024,   # 256 MiB mapeados en memoria para las lecturas.
+    "cache_size": -64 * 1024,         # Negativo = KiB: 64 MiB de caché de páginas.
+    "temp_store": "MEMORY",
+}
 
 # --- Iconografía ---
 # Usamos un diccionario para que sea fácil añadir o cambiar iconos sin tocar la lógica.
@@ -16,7 +56,8 @@ ICONS = {
     "pin": "\uE718", 
     "theme": "\uE790", 
     "show_sidebar": "\uE700", 
-    "hide_sidebar": "\uE72B"
+    "hide_sidebar": "\uE72B",
+    "pending": "\uE916"
 }
 
 # --- Paleta de Colores ---
@@ -29,3 +70,29 @@ POSTIT_COLORS = {
     "Naranja Suave": "#FFDAB9", 
     "Lila": "#E6E6FA"
 }
+
+# --- Fórmulas LaTeX ---
+# Parámetros de renderizado de las fórmulas $...$ de las notas ancladas.
+FORMULA_DPI = 150
+FORMULA_FONTSIZE = 12
+# Margen transparente alrededor de cada fórmula; el mismo que daba savefig(pad_inches=0.1).
+FORMULA_PAD_INCHES = 0.1
+# Límites de la caché de fórmulas: imágenes decodificadas en memoria y bytes de PNG en disco.
+FORMULA_MEMORY_CACHE_SIZE = 256
+FORMULA_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Procesos que renderizan en paralelo las fórmulas que faltan en la caché (None = uno por
+# núcleo). Cada uno carga su propia copia de matplotlib.
+FORMULA_RENDER_WORKERS = 2
+
+# --- Satélites ---
+# Al arrancar, los satélites anclados se restauran en porciones de como mucho estos ms por
+# fotograma, para no bloquear la ventana principal cuando hay cientos de notas ancladas.
+SATELLITE_RESTORE_BUDGET_MS = 8
+
+# --- Perfilado ---
+# Mide cuánto tardan las llamadas a DataManager y las fases de creación de los satélites.
+# Desactivado no cuesta nada: los decoradores devuelven la función original. También se
+# activa con la variable de entorno NEXUS_PROFILE=1. Con él activo, F12 abre las estadísticas.
+PROFILING_ENABLED = False
+# Mediciones recientes que se conservan (las más antiguas se descartan).
+PROFILING_RING_SIZE = 2000
@@ -1,20 +1,150 @@
 # data_manager.py (Versión 3.0 - Nativa de SQLite)
 # Módulo de persistencia de datos que gestiona todas las interacciones con la base de datos SQLite.
+import functools
+import gc
+import queue
+import re
 import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from concurrent.futures import Future
+
+import profiling
+from note_store import Note, NoteStore
+
+# Palabras tal como las separa el tokenizador unicode61 de FTS5: letras y dígitos. El resto,
+# incluido "_", separa palabras y no se indexa.
+_FTS_TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+
+class _WriterThread(threading.Thread):
+    """
+    Hilo que posee la conexión de escritura y ejecuta, en orden de llegada,
+    los trabajos `job(conn)` que recibe por una cola.
+    """
+    def __init__(self, connect):
+        super().__init__(name="DataManagerWriter", daemon=True)
+        self._connect = connect
+        self._jobs = queue.Queue()
+
+    def submit(self, job):
+        """Encola un trabajo y devuelve un Future con su resultado."""
+        future = Future()
+        self._jobs.put((job, future))
+        return future
+
+    def stop(self):
+        """Termina el hilo después de ejecutar todo lo que ya estaba en la cola."""
+        self._jobs.put(None)
+        self.join()
+
+    def run(self):
+        conn = self._connect()
+        try:
+            while True:
+                item = self._jobs.get()
+                if item is None:
+                    break
+                job, future = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(job(conn))
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            conn.close()
+
+
+def _job_name(job):
+    """Método de DataManager que creó el trabajo ("flush" para DataManager.flush.<locals>.job)."""
+    parts = job.__qualname__.split(".")
+    return parts[-3] if len(parts) >= 3 and parts[-2] == "<locals>" else parts[-1]
+
+
+def _report_write_error(future):
+    """Muestra los errores de las escrituras de las que nadie espera el resultado."""
+    if future.exception() is not None:
+        print(f"Error al escribir en la base de datos: {future.exception()}")
+
 
 class DataManager:
-    def __init__(self, db_file):
-        """Inicializa el gestor de datos y establece la conexión a la base de datos."""
+    def __init__(self, db_file, write_behind_ms=None, schedule=None, pragmas=None, background_writer=False):
+        """Inicializa el gestor de datos y establece la conexión a la base de datos.
+
+        :param db_file: Ruta del archivo SQLite.
+        :param write_behind_ms: Si se indica, las escrituras de notas no se confirman una a una:
+                                se agrupan y se vuelcan en una sola transacción cada tantos ms.
+        :param schedule: Función `schedule(ms, callback)` para programar esos volcados
+                         (en la app, `root.after`). Sin ella solo se vuelca con flush() o close().
+        :param pragmas: Diccionario de PRAGMAs que se aplican a cada conexión (WAL, caché, mmap...).
+        :param background_writer: Si es True, un hilo propio posee la conexión de escritura y
+                                  `self.conn` queda como conexión de lectura para el hilo de la UI.
+                                  Requiere `journal_mode=WAL` para que las lecturas no se bloqueen.
+        """
         self.DATA_FILE = db_file
-        self.conn = sqlite3.connect(self.DATA_FILE)
-        self.conn.row_factory = sqlite3.Row
-        self._initialize_db() # Se asegura de que las tablas existan en cada arranque.
+        self.pragmas = dict(pragmas or {})
+        self.fts_enabled = False
+        self.last_load_seconds = 0.0
+        # Aumenta con cada cambio que puede alterar un resultado de búsqueda (notas nuevas,
+        # títulos o contenidos editados): permite saber si un resultado anterior sigue valiendo.
+        self.search_version = 0
+        # Estado del modo write-behind: cambios reconocidos pero aún no confirmados en disco.
+        self.write_behind_ms = write_behind_ms
+        self._schedule = schedule
+        self._pending_updates = {} # note_id -> {columna: valor} acumulado desde el último volcado
+        self._pending_deletes = set()
+        self._flush_scheduled = False
+        # Lotes (updates, deletes) de volcados que fallaron, en orden: el siguiente volcado los
+        # reintenta antes que los suyos. Es una cola segura entre hilos (falla en el hilo escritor).
+        self._failed_flushes = queue.SimpleQueue()
 
-    def _initialize_db(self):
-        """Crea las tablas de la base de datos si no existen.
-        También verifica si la base de datos está completamente vacía para añadir datos de bienvenida.
+        if background_writer:
+            self._writer = _WriterThread(self._connect)
+            self._writer.start()
+            self._write_conn = None
+            self._run_write(self._create_schema)
+            self.conn = self._connect()
+        else:
+            self._writer = None
+            self.conn = self._write_conn = self._connect()
+            self._create_schema(self.conn)
+        self._initialize_db() # Se asegura de que haya datos en cada arranque.
+
+    def _connect(self):
+        """Abre una conexión con la configuración común (row_factory y PRAGMAs)."""
+        conn = sqlite3.connect(self.DATA_FILE)
+        conn.row_factory = sqlite3.Row
+        # SQLite no aplica las claves foráneas por defecto: sin esto, borrar un tema dejaba
+        # sus notas huérfanas en la tabla (y sus imágenes, referenciadas para siempre).
+        conn.execute("PRAGMA foreign_keys = ON")
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _run_write(self, job, wait=True):
         """
-        cursor = self.conn.cursor()
+        Ejecuta `job(conn)` sobre la conexión de escritura.
+
+        Sin hilo escritor se ejecuta en el acto. Con él, se encola; si `wait` es False no se
+        espera al resultado, de modo que el hilo de la UI nunca se bloquea esperando al disco.
+        """
+        if profiling.ENABLED:
+            # Mide el trabajo en sí (SQL y commit), en el hilo que lo ejecute: "db.write.flush"...
+            job = profiling.timed(f"db.write.{_job_name(job)}")(job)
+        if self._writer is None:
+            return job(self._write_conn)
+        future = self._writer.submit(job)
+        if wait:
+            return future.result()
+        future.add_done_callback(_report_write_error)
+        return future
+
+    def _create_schema(self, conn):
+        """Crea las tablas de la base de datos si no existen."""
+        cursor = conn.cursor()
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS themes (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -34,16 +164,74 @@ class DataManager:
                 pos_y INTEGER,
                 color TEXT,
                 width INTEGER,
+                img_width INTEGER,
+                img_height INTEGER,
+                aspect REAL,
                 FOREIGN KEY (theme_id) REFERENCES themes (id) ON DELETE CASCADE
             )
         ''')
-        self.conn.commit()
+        # Migración: las bases de datos anteriores no tienen los metadatos de imagen.
+        existing_columns = {row[1] for row in cursor.execute("PRAGMA table_info(notes)")}
+        for column, column_type in (("img_width", "INTEGER"), ("img_height", "INTEGER"), ("aspect", "REAL")):
+            if column not in existing_columns:
+                cursor.execute(f"ALTER TABLE notes ADD COLUMN {column} {column_type}")
+        # Índice para agrupar las notas por tema en orden de ID sin recorrer la tabla entera.
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_theme ON notes (theme_id, id)")
+        # Índice para contar cuántas notas comparten cada imagen del almacén.
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_path ON notes (path)")
+        conn.commit()
+        self._initialize_fts(conn)
 
+    def _initialize_db(self):
+        """Verifica si la base de datos está completamente vacía para añadir datos de bienvenida."""
+        cursor = self.conn.cursor()
         # NUEVA LÓGICA: Si la base de datos está vacía, la poblamos.
         cursor.execute("SELECT COUNT(id) FROM themes")
         if cursor.fetchone()[0] == 0:
             self._create_welcome_data()
 
+    def _initialize_fts(self, conn):
+        """Crea el índice de texto completo (FTS5) sobre título y contenido de las notas.
+
+        La tabla virtual es de contenido externo: no duplica el texto, solo el índice.
+        Los triggers la mantienen sincronizada con cada INSERT, UPDATE y DELETE sobre
+        `notes`, así que add_note/update_note/delete_note no tienen que ocuparse de ella.
+        Si el SQLite del sistema no trae FTS5, se desactiva y la búsqueda usa LIKE.
+        """
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes_fts'")
+        already_exists = cursor.fetchone() is not None
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+                    title, content,
+                    content='notes', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"FTS5 no disponible, la búsqueda será lineal: {e}")
+            self.fts_enabled = False
+            return
+
+        cursor.executescript('''
+            CREATE TRIGGER IF NOT EXISTS notes_fts_ai AFTER INSERT ON notes BEGIN
+                INSERT INTO notes_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+            END;
+            CREATE TRIGGER IF NOT EXISTS notes_fts_ad AFTER DELETE ON notes BEGIN
+                INSERT INTO notes_fts(notes_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+            END;
+            CREATE TRIGGER IF NOT EXISTS notes_fts_au AFTER UPDATE OF title, content ON notes BEGIN
+                INSERT INTO notes_fts(notes_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+                INSERT INTO notes_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+            END;
+        ''')
+        # Bases de datos anteriores al índice: lo construimos una sola vez con las notas existentes.
+        if not already_exists:
+            cursor.execute("INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')")
+        conn.commit()
+        self.fts_enabled = True
+
     def _create_welcome_data(self):
         """Inserta los datos de bienvenida en una base de datos vacía."""
         print("Base de datos vacía detectada. Creando datos de bienvenida...")
@@ -59,103 +247,379 @@ class DataManager:
         print("Datos de bienvenida creados.")
 
 
-    def load_data(self):
-        """Carga todos los datos desde la DB y los reconstruye en el formato que la app espera."""
-        app_data = {}
+    # Columnas de `notes` en el orden en que las lee _note_from_row.
+    _NOTE_COLUMNS = ("id", "title", "type", "content", "path", "pinned", "pos_x", "pos_y", "color", "width",
+                     "img_width", "img_height", "aspect")
+
+    @staticmethod
+    def _note_from_row(row):
+        """Construye la nota (limpia) que espera la app a partir de una tupla de _NOTE_COLUMNS.
+
+        El tipo y el color se repiten en casi todas las notas: se internan para que todas
+        compartan el mismo objeto str en lugar de uno por fila.
+        """
+        note_type, color = row[2], row[8]
+        return Note.from_values(
+            row[0], row[1], note_type and sys.intern(note_type), row[3], row[4], bool(row[5]),
+            row[6], row[7], color and sys.intern(color), row[9], row[10], row[11], row[12]
+        )
+
+    @profiling.timed("db.load_data")
+    def load_data(self, lazy=False):
+        """Carga todos los datos desde la DB en un NoteStore, con el formato que la app espera.
+
+        Todas las notas se leen con una única consulta ordenada por tema, que se recorre
+        en streaming agrupando las filas a medida que llegan (sin una consulta por tema).
+
+        :param lazy: Si es True, solo se cargan las notas ancladas (necesarias para los
+                     satélites); el resto de cada tema se carga con load_theme_notes()
+                     la primera vez que se selecciona.
+        """
+        self.flush(wait=True) # Con el hilo escritor, lo pendiente aún no es visible para self.conn.
+        start = time.perf_counter()
+        store = NoteStore()
         cursor = self.conn.cursor()
-        
-        cursor.execute("SELECT * FROM themes ORDER BY name")
-        themes = cursor.fetchall()
+        cursor.row_factory = None # Tuplas simples: mucho más baratas que sqlite3.Row por fila.
+
+        # El tema va al final: las columnas de la nota quedan al principio de la fila y
+        # _note_from_row la lee sin copiarla (row[1:] costaba una tupla nueva por nota).
+        pinned_filter = "AND n.pinned" if lazy else ""
+        cursor.execute(f'''
+            SELECT {", ".join("n." + column for column in self._NOTE_COLUMNS)}, t.name
+            FROM themes t
+            LEFT JOIN notes n ON n.theme_id = t.id {pinned_filter}
+            ORDER BY t.name, n.id
+        ''')
+
+        note_count = 0
+        current_name = None
+        notes = []
+        note_from_row = self._note_from_row
+        # Cada Note es un objeto que sigue el recolector de ciclos (un dict de escalares no lo
+        # era): con cientos de miles, sus pasadas durante la carga costaban casi tanto como
+        # construirlas. Aquí no se crean ciclos, así que se pausa hasta terminar.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for row in cursor:
+                if row[-1] != current_name:
+                    if notes:
+                        store.add_many(current_name, notes) # Cada tema se indexa de una vez.
+                        note_count += len(notes)
+                        notes = []
+                    current_name = row[-1]
+                    store.add_theme(current_name)
+                if row[0] is not None: # LEFT JOIN: un tema sin notas trae una fila con columnas nulas.
+                    notes.append(note_from_row(row))
+            if notes:
+                store.add_many(current_name, notes)
+                note_count += len(notes)
+        finally:
+            if gc_enabled:
+                gc.enable()
+        if lazy:
+            store.partial_themes.update(store.themes())
+
+        self.last_load_seconds = time.perf_counter() - start
+        mode = "diferida" if lazy else "completa"
+        print(f"Carga {mode}: {len(store)} temas y {note_count} notas en {self.last_load_seconds * 1000:.1f} ms.")
 
-        for theme in themes:
-            theme_name = theme['name']
-            app_data[theme_name] = []
-            
-            cursor.execute('''
-                SELECT * FROM notes WHERE theme_id = ? ORDER BY id
-            ''', (theme['id'],))
-            notes = cursor.fetchall()
-
-            for note in notes:
-                note_dict = {
-                    "id": note['id'],
-                    "titulo": note['title'],
-                    "type": note['type'],
-                    "contenido": note['content'],
-                    "path": note['path'],
-                    "anclado": bool(note['pinned']),
-                    "pos_x": note['pos_x'],
-                    "pos_y": note['pos_y'],
-                    "color": note['color'],
-                    "width": note['width']
-                }
-                app_data[theme_name].append(note_dict)
-        
         # La configuración sigue siendo simple, no necesita base de datos por ahora.
         default_settings = {"theme": "dark", "sidebar_visible": True}
-        return app_data, default_settings
+        return store, default_settings
+
+    @profiling.timed("db.load_theme_notes")
+    def load_theme_notes(self, theme_name):
+        """Carga todas las notas de un tema, en orden de ID. Complementa a load_data(lazy=True)."""
+        self.flush(wait=True)
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(f'''
+            SELECT {", ".join(self._NOTE_COLUMNS)} FROM notes
+            WHERE theme_id = (SELECT id FROM themes WHERE name = ?)
+            ORDER BY id
+        ''', (theme_name,))
+        return [self._note_from_row(row) for row in cursor]
+
+    @profiling.timed("db.delete_orphan_notes")
+    def delete_orphan_notes(self):
+        """
+        Borra las notas que quedaron sin tema antes de activar las claves foráneas.
+
+        Devuelve las rutas de las imágenes que usaban, para pasarlas a ImageStore.release:
+        así sus archivos y derivados no se quedan para siempre en la carpeta de imágenes.
+        """
+        self.flush()
+
+        def job(conn):
+            orphans = "FROM notes WHERE theme_id NOT IN (SELECT id FROM themes)"
+            paths = [row[0] for row in conn.execute(f"SELECT DISTINCT path {orphans} AND type = 'image' AND path IS NOT NULL")]
+            conn.execute(f"DELETE {orphans}")
+            conn.commit()
+            return paths
+        return self._run_write(job)
+
+    @profiling.timed("db.count_path_references")
+    def count_path_references(self, path):
+        """Número de notas que apuntan al archivo `path` (conteo de referencias de una imagen)."""
+        self.flush(wait=True)
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM notes WHERE path = ?", (path,))
+        return cursor.fetchone()[0]
+
+    @staticmethod
+    def _build_fts_query(query):
+        """Convierte el texto del buscador en una consulta FTS5 segura.
+
+        Cada palabra se entrecomilla (para neutralizar la sintaxis de FTS5) y se
+        busca como prefijo, de modo que "ecua" encuentra "ecuación".
+        """
+        tokens = _FTS_TOKEN_PATTERN.findall(query)
+        return " ".join(f'"{token}"*' for token in tokens)
+
+    @staticmethod
+    def _fold(text):
+        """Minúsculas y sin tildes, como el tokenizador unicode61 de FTS5."""
+        decomposed = unicodedata.normalize("NFKD", text.casefold())
+        return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+    def note_matcher(self, query):
+        """
+        Devuelve `match(title, content)`, el criterio de search_notes evaluado en memoria.
+
+        Sirve para acotar un resultado ya obtenido cuando la búsqueda se amplía ("ecu" ->
+        "ecua"): cualquier nota que encaje con la consulta nueva encajaba con la anterior.
+        """
+        tokens = _FTS_TOKEN_PATTERN.findall(query) if self.fts_enabled else []
+        if tokens:
+            # Cada palabra debe empezar una palabra del texto; "_" también separa palabras.
+            patterns = [re.compile(r"(?<![^\W_])" + re.escape(self._fold(token))) for token in tokens]
+            fold = self._fold
+
+            def match(title, content):
+                text = f"{fold(title)}\n{fold(content)}"
+                return all(pattern.search(text) for pattern in patterns)
+        else:
+            needle = query.lower()
+
+            def match(title, content):
+                return needle in title.lower() or needle in content.lower()
+        return match
+
+    @profiling.timed("db.search_notes")
+    def search_notes(self, theme_name, query, limit=None):
+        """
+        Busca notas de un tema por título y contenido.
+
+        :param theme_name: El nombre del tema en el que buscar.
+        :param query: El texto introducido por el usuario.
+        :param limit: Número máximo de resultados, o None para no limitar.
+        :return: Lista de IDs de nota ordenada por relevancia (el título pesa más que el contenido).
+        """
+        self.flush(wait=True) # El índice solo ve lo que ya está confirmado en la tabla.
+        cursor = self.conn.cursor()
+        sql_limit = -1 if limit is None else limit
+
+        # Una consulta sin palabras indexables ("$", "%", "_") no tiene nada que buscar en el
+        # índice: se busca como subcadena, igual que sin FTS5.
+        fts_query = self._build_fts_query(query) if self.fts_enabled else ""
+        if fts_query:
+            cursor.execute('''
+                SELECT notes.id FROM notes_fts
+                JOIN notes ON notes.id = notes_fts.rowid
+                JOIN themes ON themes.id = notes.theme_id
+                WHERE notes_fts MATCH ? AND themes.name = ?
+                ORDER BY bm25(notes_fts, 10.0, 1.0)
+                LIMIT ?
+            ''', (fts_query, theme_name, sql_limit))
+        else:
+            # "%", "_" y "\" se escapan para que LIKE los busque literalmente.
+            escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            pattern = f"%{escaped}%"
+            cursor.execute('''
+                SELECT notes.id FROM notes
+                JOIN themes ON themes.id = notes.theme_id
+                WHERE themes.name = ? AND (notes.title LIKE ? ESCAPE '\\' OR notes.content LIKE ? ESCAPE '\\')
+                ORDER BY notes.id
+                LIMIT ?
+            ''', (theme_name, pattern, pattern, sql_limit))
+        return [row[0] for row in cursor.fetchall()]
+
+    def iter_notes(self, theme_names=None, chunk_size=5000):
+        """
+        Recorre en streaming (tema, nota) de los temas indicados, o de todos si es None.
+
+        Un tema sin notas produce (tema, None). La lectura usa una conexión propia. Con WAL
+        (modo de alto rendimiento) va dentro de una única transacción: una foto coherente de la
+        base de datos que no bloquea a los escritores. Sin WAL, una transacción de lectura
+        abierta haría fallar los commits de la app ("database is locked"), así que se lee en
+        bloques de `chunk_size` filas, cada uno en su propia lectura corta; los cambios hechos
+        mientras tanto pueden aparecer o no en el resultado.
+        """
+        self.flush(wait=True)
+        conn = self._connect()
+        try:
+            snapshot = conn.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+            conditions, params = [], []
+            if theme_names is not None:
+                theme_names = list(theme_names)
+                conditions.append(f"t.name IN ({', '.join('?' * len(theme_names))})")
+                params += theme_names
+            cursor = conn.cursor()
+            cursor.row_factory = None
+
+            def query(extra_conditions, extra_params, limit=""):
+                where = " AND ".join(conditions + extra_conditions)
+                return cursor.execute(f'''
+                    SELECT t.name, {", ".join("n." + column for column in self._NOTE_COLUMNS)}
+                    FROM themes t
+                    LEFT JOIN notes n ON n.theme_id = t.id
+                    {"WHERE " + where if where else ""}
+                    ORDER BY t.name, n.id
+                    {limit}
+                ''', params + extra_params)
+
+            if snapshot:
+                conn.execute("BEGIN")
+                for row in query([], []):
+                    yield row[0], (self._note_from_row(row[1:]) if row[1] is not None else None)
+                return
+
+            last = None # (tema, id) de la última fila leída; un tema vacío tiene id NULL (0)
+            while True:
+                if last is None:
+                    rows = query([], [], f"LIMIT {int(chunk_size)}").fetchall()
+                else:
+                    rows = query(["(t.name, IFNULL(n.id, 0)) > (?, ?)"], list(last), f"LIMIT {int(chunk_size)}").fetchall()
+                for row in rows:
+                    yield row[0], (self._note_from_row(row[1:]) if row[1] is not None else None)
+                if len(rows) < chunk_size:
+                    return
+                last = (rows[-1][0], rows[-1][1] or 0)
+        finally:
+            conn.close()
+
+    def write(self, job):
+        """
+        Ejecuta `job(conn)` en la conexión de escritura (en el hilo escritor si lo hay) y
+        devuelve su resultado. Antes se vuelcan los cambios pendientes.
+
+        Es la vía para escrituras masivas de otros módulos (importadores): `job` gestiona sus
+        propias transacciones. Como puede cambiar notas en bloque, invalida los resultados
+        de búsqueda anteriores.
+        """
+        self.flush()
+        self.search_version += 1
+        return self._run_write(job)
 
     def close(self):
-        """Cierra la conexión a la base de datos."""
+        """Vuelca los cambios pendientes y cierra las conexiones a la base de datos."""
         if self.conn:
+            self.flush(wait=True)
+            if self._writer is not None:
+                self._writer.stop() # Cierra la conexión de escritura en su propio hilo.
             self.conn.close()
+            self.conn = self._write_conn = None
+
+    # --- Escritura diferida (write-behind) ---
+
+    def _request_flush(self):
+        """Programa un volcado si no hay ya uno pendiente."""
+        if self._flush_scheduled or self._schedule is None:
+            return
+        self._flush_scheduled = True
+        self._schedule(self.write_behind_ms, self._scheduled_flush)
+
+    def _scheduled_flush(self):
+        self._flush_scheduled = False
+        if self.conn:
+            try:
+                self.flush(wait=False)
+            except sqlite3.Error as e:
+                # Los cambios siguen en cola: se reintentan en el próximo volcado.
+                print(f"Error al guardar los cambios pendientes: {e}")
+                self._request_flush()
+
+    @profiling.timed("db.flush")
+    def flush(self, wait=True):
+        """
+        Escribe en una sola transacción todas las modificaciones pendientes.
+
+        Las actualizaciones ya vienen agrupadas por ID de nota (solo se escribe el último
+        valor de cada columna modificada) y las notas borradas descartan su actualización
+        pendiente. Las notas con el mismo conjunto de columnas comparten un único executemany.
+        Con el hilo escritor, flush(wait=True) sirve además de barrera: al volver, todo lo
+        encolado antes ya está confirmado y es visible para la conexión de lectura.
+
+        Si la escritura falla (p. ej. "database is locked"), el lote no se pierde: queda en
+        `_failed_flushes` y el siguiente volcado lo escribe antes que lo nuevo, respetando el orden.
+        """
+        updates = {} # columnas -> lista de parámetros
+        for note_id, values in self._pending_updates.items():
+            columns = tuple(values)
+            updates.setdefault(columns, []).append(tuple(values.values()) + (note_id,))
+        deletes = [(note_id,) for note_id in self._pending_deletes]
+        self._pending_updates.clear()
+        self._pending_deletes.clear()
+        if (self._writer is None and not updates and not deletes and self._failed_flushes.empty()
+                and not self._write_conn.in_transaction):
+            return
+
+        def job(conn):
+            batches = []
+            while not self._failed_flushes.empty():
+                batches.append(self._failed_flushes.get())
+            if updates or deletes:
+                batches.append((updates, deletes))
+            try:
+                for batch_updates, batch_deletes in batches:
+                    for columns, params in batch_updates.items():
+                        conn.executemany(self._update_sql(columns), params)
+                    if batch_deletes:
+                        conn.executemany("DELETE FROM notes WHERE id = ?", batch_deletes)
+                if conn.in_transaction:
+                    conn.commit()
+            except Exception:
+                # Sin rollback: la transacción abierta incluye los INSERT diferidos de add_note,
+                # cuyos IDs ya usa la app. Los UPDATE y DELETE son idempotentes al reintentarlos.
+                for batch in batches:
+                    self._failed_flushes.put(batch)
+                raise
+        self._run_write(job, wait=wait)
 
     # --- Métodos de escritura (CRUD: Create, Read, Update, Delete) ---
-    # Estos métodos ya están bien y no necesitan cambios.
     # Son la API interna para interactuar con la base de datos.
+    # Las operaciones sobre temas son poco frecuentes: vuelcan lo pendiente y confirman al momento.
     
+    @profiling.timed("db.add_theme")
     def add_theme(self, theme_name):
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute("INSERT INTO themes (name) VALUES (?)", (theme_name,))
-            self.conn.commit()
-            return cursor.lastrowid
-        except sqlite3.IntegrityError:
-            self.conn.rollback()
-            return None
+        self.flush()
 
-    def add_note(self, theme_name, note_dict):
-        """
-        Agrega una nota a la base de datos.
+        def job(conn):
+            try:
+                cursor = conn.cursor()
+                cursor.execute("INSERT INTO themes (name) VALUES (?)", (theme_name,))
+                conn.commit()
+                return cursor.lastrowid
+            except sqlite3.IntegrityError:
+                conn.rollback()
+                return None
+        return self._run_write(job)
 
-        :param theme_name: El nombre del tema al que pertenece la nota.
-        :param note_dict: Un diccionario que contiene los datos de la nota.
-        :return: El ID de la nota recién agregada, o None si no se pudo agregar.
-        """
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id FROM themes WHERE name = ?", (theme_name,))
-        theme_row = cursor.fetchone()
-        if not theme_row:
-            return None
-        theme_id = theme_row['id']
+    # INSERT de una nota completa. Los importadores lo usan con executemany.
+    INSERT_NOTE_SQL = '''
+        INSERT INTO notes (theme_id, title, type, content, path, pinned, pos_x, pos_y, color, width,
+                           img_width, img_height, aspect)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
 
-        cursor.execute('''
-            INSERT INTO notes (theme_id, title, type, content, path, pinned, pos_x, pos_y, color, width)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+    @staticmethod
+    def note_insert_params(theme_id, note_dict):
+        """Parámetros de INSERT_NOTE_SQL para una nota en el formato de la app."""
+        return (
             theme_id,
             note_dict.get('titulo'),
-            note_dict.get('type'),
-            note_dict.get('contenido'),
-            note_dict.get('path'),
-            note_dict.get('anclado', False),
-            note_dict.get('pos_x'),
-            note_dict.get('pos_y'),
-            note_dict.get('color'),
-            note_dict.get('width')
-        ))
-        self.conn.commit()
-        return cursor.lastrowid
-
-    def update_note(self, note_id, note_dict):
-        """Actualiza una nota existente usando su ID único."""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            UPDATE notes SET
-                title = ?, content = ?, path = ?, pinned = ?, pos_x = ?, pos_y = ?, color = ?, width = ?
-            WHERE id = ?
-        ''', (
-            note_dict.get('titulo'),
+            note_dict.get('type', 'text'),
             note_dict.get('contenido'),
             note_dict.get('path'),
             note_dict.get('anclado', False),
@@ -163,10 +627,93 @@ class DataManager:
             note_dict.get('pos_y'),
             note_dict.get('color'),
             note_dict.get('width'),
-            note_id
-        ))
-        self.conn.commit()
+            note_dict.get('img_width'),
+            note_dict.get('img_height'),
+            note_dict.get('aspect')
+        )
+
+    @profiling.timed("db.add_note")
+    def add_note(self, theme_name, note_dict):
+        """
+        Agrega una nota a la base de datos.
+
+        :param theme_name: El nombre del tema al que pertenece la nota.
+        :param note_dict: Un diccionario que contiene los datos de la nota.
+        :return: El ID de la nota recién agregada, o None si no se pudo agregar.
+        """
+        defer_commit = bool(self.write_behind_ms)
+
+        def job(conn):
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM themes WHERE name = ?", (theme_name,))
+            theme_row = cursor.fetchone()
+            if not theme_row:
+                return None
+            cursor.execute(self.INSERT_NOTE_SQL, self.note_insert_params(theme_row['id'], note_dict))
+            # El INSERT se ejecuta ya para conocer el ID; en modo write-behind solo se difiere el commit.
+            if not defer_commit:
+                conn.commit()
+            return cursor.lastrowid
+
+        new_id = self._run_write(job)
+        self.search_version += 1
+        if defer_commit:
+            self._request_flush()
+        return new_id
+
+    # Campo de la nota en la app -> columna de `notes` que se puede actualizar.
+    _FIELD_COLUMNS = {
+        "titulo": "title", "contenido": "content", "path": "path", "anclado": "pinned",
+        "pos_x": "pos_x", "pos_y": "pos_y", "color": "color", "width": "width",
+        "img_width": "img_width", "img_height": "img_height", "aspect": "aspect"
+    }
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _update_sql(columns):
+        """UPDATE de solo esas columnas. En la práctica hay un puñado de combinaciones
+        (posición, ancho, título, contenido...), así que cada sentencia se construye una vez
+        y sqlite3 reutiliza su versión preparada."""
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        return f"UPDATE notes SET {assignments} WHERE id = ?"
+
+    def _changed_values(self, note_dict, fields):
+        """{columna: valor} de los campos indicados, en el orden fijo de _FIELD_COLUMNS."""
+        return {column: note_dict.get(field) for field, column in self._FIELD_COLUMNS.items() if field in fields}
+
+    @profiling.timed("db.update_note")
+    def update_note(self, note_id, note_dict, fields=None):
+        """
+        Actualiza una nota existente usando su ID único.
+
+        Solo se escriben las columnas que han cambiado: las de `fields` si se indica, si no
+        los campos modificados de la Note (que queda marcada como guardada). Con un
+        diccionario normal se escriben todos los campos que contenga, como antes.
+        """
+        if fields is None:
+            fields = note_dict.take_dirty() if isinstance(note_dict, Note) else note_dict.keys()
+        values = self._changed_values(note_dict, fields)
+        if not values:
+            return
+        if "title" in values or "content" in values:
+            self.search_version += 1
+        if self.write_behind_ms:
+            if note_id not in self._pending_deletes:
+                pending = self._pending_updates.setdefault(note_id, {})
+                pending.update(values)
+                # Orden fijo de columnas: así las notas con los mismos cambios comparten sentencia.
+                self._pending_updates[note_id] = {column: pending[column] for column in self._FIELD_COLUMNS.values() if column in pending}
+                self._request_flush()
+            return
+        sql = self._update_sql(tuple(values))
+        params = tuple(values.values()) + (note_id,)
+
+        def job(conn):
+            conn.execute(sql, params)
+            conn.commit()
+        self._run_write(job, wait=False)
         
+    @profiling.timed("db.delete_note")
     def delete_note(self, note_id):
         """
         Elimina una nota de la base de datos.
@@ -174,10 +721,18 @@ class DataManager:
         Parámetros:
             note_id (int): El ID único de la nota a eliminar.
         """
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM notes WHERE id = ?", (note_id,))
-        self.conn.commit()
+        if self.write_behind_ms:
+            self._pending_updates.pop(note_id, None)
+            self._pending_deletes.add(note_id)
+            self._request_flush()
+            return
 
+        def job(conn):
+            conn.execute("DELETE FROM notes WHERE id = ?", (note_id,))
+            conn.commit()
+        self._run_write(job, wait=False)
+
+    @profiling.timed("db.delete_theme")
     def delete_theme(self, theme_name):
         """
         Elimina un tema de la base de datos.
@@ -188,11 +743,14 @@ class DataManager:
         Devuelve:
             None
         """
+        self.flush()
 
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM themes WHERE name = ?", (theme_name,))
-        self.conn.commit()
+        def job(conn):
+            conn.execute("DELETE FROM themes WHERE name = ?", (theme_name,))
+            conn.commit()
+        self._run_write(job)
         
+    @profiling.timed("db.rename_theme")
     def rename_theme(self, old_name, new_name):
         """
         Renombra un tema existente.
@@ -202,6 +760,9 @@ class DataManager:
 
         Actualiza la base de datos con el nuevo nombre del tema.
         """
-        cursor = self.conn.cursor()
-        cursor.execute("UPDATE themes SET name = ? WHERE name = ?", (new_name, old_name))
-        self.conn.commit()
\ No newline at end of file
+        self.flush()
+
+        def job(conn):
+            conn.execute("UPDATE themes SET name = ? WHERE name = ?", (new_name, old_name))
+            conn.commit()
+        self._run_write(job)
@@ -0,0 +1,130 @@
+# formula_cache.py
+# Caché de fórmulas LaTeX ya renderizadas, direccionada por contenido.
+# Una fórmula se identifica por (texto, color, dpi, tamaño de fuente): si nada de eso cambia,
+# la imagen resultante es idéntica y no hace falta volver a pasar por matplotlib.
+import hashlib
+import os
+from collections import OrderedDict
+
+
+class FormulaCache:
+    """
+    Caché de dos niveles para imágenes de fórmulas.
+
+    1. Memoria: LRU de imágenes PIL ya decodificadas.
+    2. Disco: un PNG por clave en `cache_dir`, con tamaño total acotado; cuando se supera,
+       se eliminan primero los archivos usados hace más tiempo.
+
+    La caché no renderiza: lookup_many() dice qué fórmulas faltan y quien las renderice
+    (formula_pool.FormulaRenderPool) las añade con store().
+    """
+    def __init__(self, cache_dir, max_disk_bytes=64 * 1024 * 1024, max_memory_items=256):
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_items = max_memory_items
+        self._memory = OrderedDict()  # clave -> Image
+        self._invalid = set()         # claves cuyo render falló: no se reintentan
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._disk_sizes = {}         # clave -> bytes en disco
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(".png"):
+                self._disk_sizes[entry.name[:-4]] = entry.stat().st_size
+        self._disk_total = sum(self._disk_sizes.values())
+
+    @staticmethod
+    def make_key(formula, color, dpi, fontsize):
+        """Clave estable (y válida como nombre de archivo) para una combinación de parámetros."""
+        raw = f"{formula}\0{color}\0{dpi}\0{fontsize}".encode("utf-8")
+        return hashlib.sha1(raw).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.png")
+
+    def lookup_many(self, formulas, color, dpi, fontsize):
+        """
+        Busca varias fórmulas solo en las cachés, sin renderizar nada.
+
+        Devuelve (resultados, fallos): un diccionario fórmula -> imagen (None si es inválida) y la
+        lista de fórmulas que hay que renderizar, que luego se añaden con store().
+        """
+        results, misses = {}, []
+        for formula in dict.fromkeys(formulas): # Sin duplicados, conservando el orden.
+            key = self.make_key(formula, color, dpi, fontsize)
+            if key in self._invalid:
+                results[formula] = None
+            elif key in self._memory:
+                self._memory.move_to_end(key)
+                results[formula] = self._memory[key]
+            else:
+                image = self._load_from_disk(key)
+                if image is None:
+                    misses.append(formula)
+                else:
+                    self._remember(key, image)
+                    results[formula] = image
+        return results, misses
+
+    def store(self, formula, color, dpi, fontsize, image):
+        """Guarda una fórmula renderizada fuera de la caché; con `image` None la marca como inválida."""
+        key = self.make_key(formula, color, dpi, fontsize)
+        if image is None:
+            self._invalid.add(key)
+        else:
+            self._store_on_disk(key, image)
+            self._remember(key, image)
+
+    def _remember(self, key, image):
+        self._memory[key] = image
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _load_from_disk(self, key):
+        if key not in self._disk_sizes:
+            return None
+        from PIL import Image
+        path = self._disk_path(key)
+        try:
+            with Image.open(path) as img:
+                img.load()
+                image = img.copy()
+            os.utime(path) # Marca el uso para que la expulsión sea LRU también en disco.
+            return image
+        except (OSError, ValueError):
+            self._forget_disk_entry(key)
+            return None
+
+    def _store_on_disk(self, key, image):
+        path = self._disk_path(key)
+        try:
+            image.save(path, format="PNG")
+            size = os.path.getsize(path)
+        except OSError as e:
+            print(f"No se pudo guardar la fórmula en la caché de disco: {e}")
+            return
+        self._disk_total += size - self._disk_sizes.get(key, 0)
+        self._disk_sizes[key] = size
+        if self._disk_total > self.max_disk_bytes:
+            self._evict_disk()
+
+    def _forget_disk_entry(self, key):
+        self._disk_total -= self._disk_sizes.pop(key, 0)
+        try:
+            os.remove(self._disk_path(key))
+        except OSError:
+            pass
+
+    def _evict_disk(self):
+        """Borra los PNG menos usados hasta quedar por debajo del 90% del límite."""
+        target = int(self.max_disk_bytes * 0.9)
+        by_age = []
+        for key in self._disk_sizes:
+            try:
+                by_age.append((os.path.getmtime(self._disk_path(key)), key))
+            except OSError:
+                by_age.append((0, key))
+        by_age.sort()
+        for _, key in by_age:
+            if self._disk_total <= target:
+                break
+            self._forget_disk_entry(key)
@@ -0,0 +1,171 @@
+# formula_pool.py
+# Renderizado de fórmulas LaTeX en procesos aparte.
+# Renderizar una nota con decenas de fórmulas bloqueaba el bucle de eventos durante segundos, y
+# matplotlib no se puede usar con seguridad desde varios hilos. Aquí cada fórmula que falta en
+# la caché se renderiza en un ProcessPoolExecutor; los PNG resultantes se recogen con
+# `root.after` y se entregan, ya decodificados y guardados en la caché, en el hilo de Tk.
+import io
+import multiprocessing
+import queue
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import profiling
+from config import FORMULA_PAD_INCHES
+from formula_worker import render_formula_png
+
+# Órdenes LaTeX (\frac, \alpha...): a efectos de tamaño cuentan como un carácter.
+_COMMAND_PATTERN = re.compile(r'\\[a-zA-Z]+')
+# Caracteres que no ocupan sitio por sí mismos.
+_MARKUP_PATTERN = re.compile(r'[${}^_\s]')
+# Envíos de una misma fórmula si los procesos mueren (memoria, fallo de matplotlib...).
+_MAX_ATTEMPTS = 2
+
+
+def estimate_formula_size(formula, dpi, fontsize):
+    """
+    Tamaño aproximado (ancho, alto) en píxeles de la imagen de una fórmula, sin renderizarla.
+
+    Sirve para reservar el hueco de la fórmula mientras se renderiza; incluye el mismo margen
+    que el renderizador (FORMULA_PAD_INCHES).
+    """
+    px_per_pt = dpi / 72
+    chars = len(_MARKUP_PATTERN.sub("", _COMMAND_PATTERN.sub("x", formula)))
+    pad = 2 * int(round(FORMULA_PAD_INCHES * dpi))
+    return int(max(1, chars) * fontsize * px_per_pt * 0.6) + pad, int(fontsize * px_per_pt * 1.4) + pad
+
+
+class FormulaRenderPool:
+    """
+    Cola de renderizado de fórmulas delante de una FormulaCache.
+
+    Parameters
+    ----------
+    root : tk.Tk
+        Ventana principal, para sondear los resultados con `after`.
+    cache : FormulaCache
+        Caché que se consulta antes de renderizar y donde se guardan los resultados.
+    dpi, fontsize : int
+        Parámetros de renderizado de todas las fórmulas.
+    max_workers : int, optional
+        Procesos de renderizado (None = uno por núcleo). Se lanzan con la primera fórmula que
+        falte en la caché, no al arrancar.
+    poll_ms : int
+        Intervalo de sondeo de resultados mientras hay fórmulas en curso.
+    """
+    def __init__(self, root, cache, dpi, fontsize, max_workers=None, poll_ms=30):
+        self.root = root
+        self.cache = cache
+        self.dpi = dpi
+        self.fontsize = fontsize
+        self.max_workers = max_workers
+        self.poll_ms = poll_ms
+        self._executor = None
+        self._waiting = {}            # (fórmula, color) -> callbacks a avisar cuando esté lista
+        self._results = queue.Queue() # (fórmula, color, intento, inicio, executor, future) terminados
+        self._polling = False
+
+    def request(self, formulas, color, callback):
+        """
+        Pide las imágenes de `formulas` en el color dado.
+
+        Devuelve (listas, pendientes): un diccionario fórmula -> imagen PIL (None si es inválida)
+        con las que ya estaban en caché, y la lista de las que se están renderizando. Por cada
+        pendiente se llamará, en el hilo de Tk, `callback(fórmula, color, imagen)`.
+
+        Si un proceso muere, el pool se sustituye por otro y la fórmula se reenvía. Si vuelve a
+        fallar, no se llama al callback (no es que la fórmula sea inválida): queda sin imagen y
+        se volverá a pedir la próxima vez que se abra la nota.
+        """
+        ready, misses = self.cache.lookup_many(formulas, color, self.dpi, self.fontsize)
+        for formula in misses:
+            key = (formula, color)
+            if key in self._waiting:
+                self._waiting[key].append(callback) # Ya se está renderizando para otro satélite.
+            else:
+                self._waiting[key] = [callback]
+                self._submit(formula, color)
+        return ready, misses
+
+    def _submit(self, formula, color, attempt=1):
+        if self._executor is None:
+            # "spawn": hacer fork de un proceso con hilos en marcha (escritor de la base de datos,
+            # importación de imágenes) puede dejar cerrojos tomados en el hijo.
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        executor = self._executor
+        try:
+            future = executor.submit(render_formula_png, formula, color, self.dpi, self.fontsize)
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            self._retry_or_drop(formula, color, attempt)
+            return
+        profiling.count("formula_renders")
+        start = time.perf_counter()
+        future.add_done_callback(lambda f: self._results.put((formula, color, attempt, start, executor, f)))
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_ms, self._poll)
+
+    def _discard_executor(self, executor):
+        """Descarta un pool roto; el siguiente envío crea uno nuevo."""
+        if self._executor is executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _retry_or_drop(self, formula, color, attempt):
+        if attempt < _MAX_ATTEMPTS:
+            self._submit(formula, color, attempt + 1)
+        else:
+            print(f"No se pudo renderizar la fórmula {formula!r}: los procesos de renderizado fallaron.")
+            self._waiting.pop((formula, color), None)
+
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    formula, color, attempt, start, executor, future = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                self._deliver(formula, color, attempt, start, executor, future)
+        finally:
+            # Pase lo que pase con un callback, los demás resultados siguen llegando.
+            if self._waiting:
+                self.root.after(self.poll_ms, self._poll)
+            else:
+                self._polling = False
+
+    def _deliver(self, formula, color, attempt, start, executor, future):
+        try:
+            result = future.result()
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            self._retry_or_drop(formula, color, attempt)
+            return
+        except Exception as e:
+            # Cancelada al cerrar, u otro fallo ajeno a la fórmula: no se marca como inválida.
+            print(f"No se pudo renderizar la fórmula {formula!r}: {e}")
+            self._waiting.pop((formula, color), None)
+            return
+        image = None
+        if result is not None:
+            from PIL import Image
+            with Image.open(io.BytesIO(result[1])) as img:
+                img.load()
+                image = img.copy()
+        self.cache.store(formula, color, self.dpi, self.fontsize, image)
+        if profiling.ENABLED:
+            profiling.record("satellite.formula_render", start, time.perf_counter() - start)
+        for callback in self._waiting.pop((formula, color), ()):
+            try:
+                callback(formula, color, image)
+            except Exception as e:
+                print(f"Error al mostrar la fórmula {formula!r}: {e}")
+
+    def shutdown(self):
+        """Cancela los renderizados pendientes y cierra los procesos sin esperarlos."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,57 @@
+# formula_renderer.py
+# Renderizador ligero de fórmulas LaTeX.
+# Usa directamente el parser mathtext de matplotlib para rasterizar cada fórmula a un buffer,
+# sin crear figuras de pyplot, sin el cálculo de bbox_inches='tight' y sin codificar/decodificar
+# un PNG en memoria. El resultado es una imagen PIL RGBA lista para ImageTk.PhotoImage.
+import numpy as np
+from matplotlib.colors import to_rgb
+from matplotlib.font_manager import FontProperties
+from matplotlib.mathtext import MathTextParser
+from PIL import Image
+
+from config import FORMULA_PAD_INCHES
+
+_parser = None
+
+
+def _get_parser():
+    """Crea el parser una sola vez: construirlo carga las fuentes de mathtext."""
+    global _parser
+    if _parser is None:
+        _parser = MathTextParser("agg")
+    return _parser
+
+
+def render_formula(formula, color="#000000", dpi=150, fontsize=12):
+    """
+    Rasteriza una fórmula ($...$) y devuelve una imagen PIL RGBA.
+
+    El parser devuelve una máscara de cobertura (0-255) de la fórmula; se usa como canal
+    alfa sobre el color pedido. Lanza ValueError si la fórmula no es válida.
+    """
+    parsed = _get_parser().parse(formula, dpi=dpi, prop=FontProperties(size=fontsize))
+    coverage = np.asarray(parsed[5], dtype=np.uint8) # El campo `image` del resultado.
+
+    height, width = coverage.shape
+    pad = int(round(FORMULA_PAD_INCHES * dpi))
+    rgba = np.zeros((height + 2 * pad, width + 2 * pad, 4), dtype=np.uint8)
+    rgba[..., :3] = [int(round(channel * 255)) for channel in to_rgb(color)]
+    rgba[pad:pad + height, pad:pad + width, 3] = coverage
+    return Image.fromarray(rgba, "RGBA")
+
+
+def render_formulas(formulas, color="#000000", dpi=150, fontsize=12):
+    """
+    Renderiza varias fórmulas de una vez, reutilizando parser y propiedades de fuente.
+
+    Devuelve una lista paralela a `formulas` con la imagen de cada una, o None si no es válida.
+    """
+    images = []
+    for formula in formulas:
+        try:
+            images.append(render_formula(formula, color, dpi, fontsize))
+        except Exception as e:
+            print(f"Error al renderizar la fórmula {formula!r}: {e}")
+            images.append(None)
+    return images
+
@@ -0,0 +1,24 @@
+# formula_worker.py
+# Función que ejecutan los procesos de formula_pool.
+# Este módulo no importa nada pesado: el proceso principal lo importa para referenciar la
+# función, y solo el proceso de renderizado carga formula_renderer (numpy, matplotlib y PIL)
+# la primera vez que la ejecuta. Así la primera fórmula que falta en la caché no congela Tk.
+import io
+
+
+def render_formula_png(formula, color="#000000", dpi=150, fontsize=12):
+    """
+    Renderiza una fórmula en el proceso de trabajo.
+
+    Devuelve ((ancho, alto), bytes del PNG), que se envían de vuelta al proceso principal sin
+    problemas, o None si la fórmula no es válida.
+    """
+    from formula_renderer import render_formula
+    try:
+        image = render_formula(formula, color, dpi, fontsize)
+    except Exception as e:
+        print(f"Error al renderizar la fórmula {formula!r}: {e}")
+        return None
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=1) # Solo viaja entre procesos: prima la velocidad.
+    return image.size, buffer.getvalue()
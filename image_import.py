@@ -0,0 +1,94 @@
+# image_import.py
+# Importación de imágenes en segundo plano.
+# Copiar una foto grande, validarla y generar sus derivados lleva cientos de ms: hecho en el
+# hilo de Tk congelaba la ventana, y con varias imágenes a la vez, durante segundos. Aquí ese
+# trabajo va a un pool de hilos (PIL y la E/S de archivos liberan el GIL) y los resultados se
+# recogen con `root.after`, de modo que los callbacks siempre se ejecutan en el hilo de Tk.
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ImageImporter:
+    """
+    Cola de importaciones de imágenes a un ImageStore.
+
+    Parameters
+    ----------
+    root : tk.Tk
+        Ventana principal, para sondear los resultados con `after`.
+    image_store : ImageStore
+        Almacén que copia, valida y genera los derivados y metadatos de cada imagen.
+    max_workers : int
+        Importaciones simultáneas.
+    poll_ms : int
+        Intervalo de sondeo de resultados mientras hay importaciones en curso.
+    """
+    def __init__(self, root, image_store, max_workers=4, poll_ms=50):
+        self.root = root
+        self.image_store = image_store
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ImageImport")
+        self._results = queue.Queue() # (callback, future) terminados, pendientes de entregar
+        self._pending = 0
+        self._polling = False
+
+    def submit(self, source_path, callback):
+        """
+        Importa `source_path` en segundo plano.
+
+        Al terminar se llama, en el hilo de Tk, `callback(resultado, error)`: resultado es
+        (ruta, metadatos) de ImageStore.import_image y error None, o al revés si falló. La
+        imagen está retenida hasta que el callback vuelve: si no ha creado una nota con ella,
+        se retira del almacén.
+        """
+        future = self._executor.submit(self.image_store.import_image, source_path, True)
+        future.add_done_callback(lambda f: self._results.put((callback, f)))
+        self._pending += 1
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    callback, future = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                self._pending -= 1
+                self._deliver(callback, future)
+        finally:
+            # Pase lo que pase con un callback, las demás importaciones siguen llegando.
+            if self._pending:
+                self.root.after(self.poll_ms, self._poll)
+            else:
+                self._polling = False
+
+    def _deliver(self, callback, future):
+        try:
+            result, error = future.result(), None
+        except Exception as e:
+            result, error = None, e
+        try:
+            callback(result, error)
+        except Exception as e:
+            print(f"Error al completar la importación de una imagen: {e}")
+        finally:
+            if result is not None:
+                self.image_store.end_import(result[0])
+
+    def shutdown(self):
+        """
+        Cancela las importaciones que aún no han empezado y espera a las que están en curso.
+
+        Sus imágenes ya no tendrán nota: se retiran del almacén si nadie más las usa. Hay que
+        llamarlo antes de cerrar la base de datos.
+        """
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        while True:
+            try:
+                _, future = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if not future.cancelled() and future.exception() is None:
+                self.image_store.end_import(future.result()[0])
@@ -0,0 +1,184 @@
+# image_store.py
+# Almacén de imágenes direccionado por contenido para la carpeta IMAGE_DIR.
+# Cada imagen se guarda una sola vez con el SHA-256 de su contenido como nombre: importar la
+# misma foto diez veces crea diez notas que comparten un único archivo. El número de notas que
+# apuntan a cada archivo es su conteo de referencias, y solo se borra cuando llega a cero.
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+from image_utils import create_derivatives, read_image_metadata, remove_image_files
+
+_CHUNK_SIZE = 1024 * 1024
+# ioctl de Linux que crea una copia "reflink" (copy-on-write) en Btrfs, XFS, etc.
+_FICLONE = 0x40049409
+# Extensiones equivalentes: la clave del almacén es hash + extensión, así que un mismo JPEG
+# importado como .jpg y como .jpeg no debe guardarse dos veces.
+_EXTENSION_ALIASES = {".jpeg": ".jpg", ".jpe": ".jpg", ".jfif": ".jpg", ".tif": ".tiff"}
+
+
+def hash_file(path):
+    """SHA-256 del archivo, leído por bloques para no cargarlo entero en memoria."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _normalize_ext(ext):
+    ext = ext.lower()
+    return _EXTENSION_ALIASES.get(ext, ext)
+
+
+def _reflink(source, dest):
+    """Intenta una copia copy-on-write. Lanza OSError si el sistema de archivos no la admite."""
+    if not sys.platform.startswith("linux"):
+        raise OSError("reflink no disponible en esta plataforma")
+    import fcntl
+    with open(source, "rb") as src, open(dest, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+
+
+class ImageStore:
+    """
+    Almacén deduplicado de imágenes con conteo de referencias.
+
+    Parameters
+    ----------
+    image_dir : str
+        Carpeta donde viven las imágenes (IMAGE_DIR).
+    data_manager : DataManager
+        Fuente de verdad de las referencias: las notas que apuntan a cada archivo.
+    derivative_sizes : tuple
+        Anchos de los derivados que se generan para cada imagen nueva.
+    allow_hardlinks : bool
+        Permite enlazar el archivo de origen en lugar de copiarlo si no hay reflink. Es lo más
+        rápido, pero el enlace comparte el archivo: si luego se edita el original fuera de la
+        app, la nota cambia también. Por eso está desactivado por defecto.
+    """
+    def __init__(self, image_dir, data_manager, derivative_sizes, allow_hardlinks=False):
+        self.image_dir = image_dir
+        self.data_manager = data_manager
+        self.derivative_sizes = derivative_sizes
+        self.allow_hardlinks = allow_hardlinks
+        # Se puede importar desde varios hilos: dos importaciones del mismo contenido no deben
+        # escribir a la vez el mismo archivo ni sus derivados.
+        self._digest_locks = {}
+        self._locks_guard = threading.Lock()
+        # Ruta -> importaciones en curso cuya nota aún no está en la base de datos. Mientras
+        # tanto release() no puede borrar el archivo aunque ninguna nota lo referencie todavía.
+        self._in_flight = {}
+
+    def _lock_for(self, digest):
+        with self._locks_guard:
+            return self._digest_locks.setdefault(digest, threading.Lock())
+
+    def _hold(self, path):
+        with self._locks_guard:
+            self._in_flight[path] = self._in_flight.get(path, 0) + 1
+
+    def import_image(self, source_path, hold=False):
+        """
+        Añade una imagen al almacén y devuelve (ruta, metadatos).
+
+        Si ya había una imagen con el mismo contenido, se reutiliza sin copiar nada. Si es
+        nueva, se copia (reflink, enlace duro o copia normal, en ese orden) y se generan sus
+        derivados. Lanza OSError si no se puede copiar o no es una imagen válida.
+
+        Con `hold`, la imagen queda retenida hasta llamar a end_import(): así un borrado de
+        otra nota que la compartía no la elimina antes de que se inserte la nota nueva.
+        """
+        digest = hash_file(source_path)
+        _, ext = os.path.splitext(source_path)
+        dest_path = os.path.join(self.image_dir, f"{digest}{_normalize_ext(ext)}")
+
+        with self._lock_for(digest):
+            if os.path.exists(dest_path):
+                metadata = read_image_metadata(dest_path)
+            else:
+                temp_path = f"{dest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                try:
+                    self._link_or_copy(source_path, temp_path)
+                    os.replace(temp_path, dest_path) # Atómico: nunca queda un blob a medio copiar.
+                finally:
+                    if os.path.exists(temp_path): os.remove(temp_path)
+                metadata = self._create_derivatives(dest_path)
+            if hold:
+                self._hold(dest_path)
+            return dest_path, metadata
+
+    def end_import(self, path):
+        """
+        Suelta la retención de import_image(hold=True), una vez insertada la nota (o descartada).
+        Si al final ninguna nota usa la imagen, se borra como en release().
+        """
+        with self._locks_guard:
+            count = self._in_flight.pop(path) - 1
+            if count:
+                self._in_flight[path] = count
+        self.release(path)
+
+    def import_stream(self, stream, ext):
+        """
+        Como import_image, pero leyendo la imagen de un objeto de archivo (por ejemplo, un
+        miembro de un zip). Se copia por bloques a un temporal mientras se calcula su hash.
+        """
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=self.image_dir)
+        try:
+            with os.fdopen(fd, "wb") as dest:
+                for chunk in iter(lambda: stream.read(_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    dest.write(chunk)
+            dest_path = os.path.join(self.image_dir, f"{digest.hexdigest()}{_normalize_ext(ext)}")
+            with self._lock_for(digest.hexdigest()):
+                if os.path.exists(dest_path):
+                    return dest_path, read_image_metadata(dest_path)
+                os.replace(temp_path, dest_path)
+                return dest_path, self._create_derivatives(dest_path)
+        finally:
+            if os.path.exists(temp_path): os.remove(temp_path)
+
+    def _create_derivatives(self, path):
+        """Genera los derivados de una imagen recién añadida; si no es válida, la retira."""
+        try:
+            return create_derivatives(path, self.derivative_sizes)
+        except OSError:
+            remove_image_files(path, self.derivative_sizes)
+            raise
+        except (SyntaxError, ValueError) as e: # PIL señala así algunos datos corruptos (p. ej. un CRC de PNG).
+            remove_image_files(path, self.derivative_sizes)
+            raise OSError(f"Imagen no válida: {e}") from e
+
+    def _link_or_copy(self, source, dest):
+        try:
+            _reflink(source, dest)
+            return
+        except OSError:
+            if os.path.exists(dest): os.remove(dest)
+        if self.allow_hardlinks:
+            try:
+                os.link(source, dest)
+                return
+            except OSError:
+                pass
+        shutil.copyfile(source, dest)
+
+    def release(self, path):
+        """
+        Se llama después de borrar una nota (o un tema) que apuntaba a `path`.
+        Borra el archivo y sus derivados solo si ya no queda ninguna nota que lo use.
+        """
+        if not path:
+            return
+        digest = os.path.splitext(os.path.basename(path))[0]
+        with self._lock_for(digest): # Que no coincida con una importación del mismo contenido.
+            with self._locks_guard:
+                if path in self._in_flight:
+                    return
+            if self.data_manager.count_path_references(path) == 0:
+                remove_image_files(path, self.derivative_sizes)
@@ -0,0 +1,104 @@
+# image_utils.py
+# Utilidades de procesamiento de imágenes para las notas de imagen.
+# PIL se importa dentro de las funciones que lo necesitan, para no penalizar el arranque.
+import os
+
+
+def build_mipmaps(image, min_size=64):
+    """
+    Construye una pirámide de resoluciones: [original, 1/2, 1/4, ...].
+
+    Cada nivel se obtiene del anterior con `Image.reduce(2)` (promedio de bloques 2x2, muy
+    rápido) y se para cuando el lado menor bajaría de `min_size` píxeles.
+    """
+    if image.mode not in ("RGB", "RGBA", "L", "LA"):
+        image = image.convert("RGBA") # reduce() no admite modos con paleta.
+    levels = [image]
+    while min(levels[-1].size) // 2 >= min_size:
+        levels.append(levels[-1].reduce(2))
+    return levels
+
+
+def pick_level(levels, width):
+    """Devuelve el nivel más pequeño de la pirámide que todavía mide al menos `width` de ancho."""
+    for level in reversed(levels):
+        if level.width >= width:
+            return level
+    return levels[0]
+
+
+# --- Derivados de tamaño de pantalla ---
+# Al importar una imagen se guardan copias reducidas junto al original ("foto@512.jpg"...),
+# para que los satélites no tengan que decodificar un original de decenas de megapíxeles.
+
+def derivative_path(path, size):
+    """Ruta del derivado de `size` píxeles de ancho de la imagen `path`."""
+    root, ext = os.path.splitext(path)
+    ext = ".jpg" if ext.lower() in (".jpg", ".jpeg") else ".png"
+    return f"{root}@{size}{ext}"
+
+
+def read_image_metadata(path):
+    """Dimensiones de la imagen leyendo solo su cabecera (sin decodificar los píxeles)."""
+    from PIL import Image
+    with Image.open(path) as img:
+        width, height = img.size
+    return {"img_width": width, "img_height": height, "aspect": height / width if width > 0 else 1}
+
+
+def create_derivatives(path, sizes):
+    """
+    Genera los derivados de `path` y devuelve sus metadatos.
+
+    Solo se generan los tamaños menores que el original (nunca se amplía). En los JPEG se usa
+    `Image.draft`, que decodifica directamente a 1/2, 1/4 u 1/8 de la resolución: reducir una
+    foto enorme no requiere descomprimirla entera.
+
+    :return: Diccionario con "img_width", "img_height" y "aspect" (alto / ancho).
+    :raises OSError: Si el archivo no es una imagen válida.
+    """
+    from PIL import Image
+    metadata = read_image_metadata(path)
+    width, aspect = metadata["img_width"], metadata["aspect"]
+    with Image.open(path) as img:
+        is_jpeg = img.format == "JPEG"
+        # Hasta aquí solo se ha leído la cabecera. Los derivados decodifican la imagen entera,
+        # pero una imagen más estrecha que todos ellos no generaría ninguno: se decodifica
+        # aquí para que un archivo truncado o corrupto se rechace al importarlo.
+        if all(size >= width for size in sizes):
+            img.load()
+
+    for size in sorted(sizes):
+        if size >= width:
+            break
+        target = (size, max(1, round(size * aspect)))
+        with Image.open(path) as img:
+            if is_jpeg:
+                img.draft("RGB", target)
+            elif img.mode not in ("RGB", "RGBA", "L", "LA"):
+                img = img.convert("RGBA") # Las paletas solo admiten remuestreo NEAREST.
+            resized = img.resize(target, Image.Resampling.LANCZOS)
+        if is_jpeg:
+            resized.convert("RGB").save(derivative_path(path, size), "JPEG", quality=90)
+        else:
+            resized.save(derivative_path(path, size), "PNG")
+
+    return metadata
+
+
+def nearest_derivative(path, width, sizes):
+    """Ruta del derivado más pequeño que mide al menos `width`, o el original si no hay ninguno."""
+    for size in sorted(sizes):
+        if size >= width:
+            candidate = derivative_path(path, size)
+            if os.path.exists(candidate):
+                return candidate
+    return path
+
+
+def remove_image_files(path, sizes):
+    """Borra una imagen y todos sus derivados. Los archivos que ya no existen se ignoran."""
+    for file_path in [path] + [derivative_path(path, size) for size in sizes]:
+        try:
+            if os.path.exists(file_path): os.remove(file_path)
+        except OSError as e: print(f"Error al eliminar archivo de imagen: {e}")
@@ -0,0 +1,230 @@
+# legacy_import.py
+# Importador del formato anterior: un único JSON {"app_data": {tema: [nota, ...]}, "app_settings": {...}}.
+#
+# El archivo se analiza en streaming (se lee por bloques y se decodifica nota a nota), así que
+# una exportación de cientos de MB no se carga entera en memoria. Las notas se insertan con
+# executemany en transacciones de `chunk_size` notas, en lugar de una transacción por nota.
+# El avance se guarda en la tabla import_progress dentro de la misma transacción que cada
+# bloque: si la importación se interrumpe, al repetirla continúa donde lo dejó.
+#
+# Uso: python legacy_import.py [nexus_notes_data.json] [--db Millon_note.db] [--chunk-size 5000]
+import argparse
+import codecs
+import json
+import os
+import time
+
+from config import DATA_FILE, LEGACY_DATA_FILE
+
+_READ_SIZE = 1024 * 1024
+_WHITESPACE = " \t\r\n"
+
+
+class _JsonStream:
+    """
+    Lector de JSON por bloques: permite recorrer a mano la estructura exterior y decodificar
+    cada valor interior (una nota) con `raw_decode`, rellenando el búfer cuando se acaba.
+    """
+    def __init__(self, file):
+        self.file = file
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """Añade el siguiente bloque al búfer, descartando lo ya consumido. False al final."""
+        if self.eof:
+            return False
+        data = self.file.read(_READ_SIZE)
+        self.eof = not data
+        self.buffer = self.buffer[self.pos:] + self.text_decoder.decode(data, final=self.eof)
+        self.pos = 0
+        return not self.eof
+
+    def peek(self):
+        """Siguiente carácter significativo (sin consumirlo), o "" al final del archivo."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"JSON inesperado: se esperaba '{char}' y se encontró '{found}'")
+        self.pos += 1
+
+    def value(self):
+        """Decodifica el siguiente valor JSON completo."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # Un número al final del búfer podría seguir en el bloque siguiente.
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def items(self):
+        """Recorre un objeto JSON como pares (clave, None) sin decodificar los valores:
+        quien itera debe consumir cada valor antes de pedir el siguiente par."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self.pos += 1
+            else:
+                self.expect("}")
+                return
+
+    def array(self):
+        """Recorre un array JSON decodificando sus elementos de uno en uno."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ",":
+                self.pos += 1
+            else:
+                self.expect("]")
+                return
+
+
+def iter_legacy_notes(file):
+    """
+    Recorre un archivo del formato anterior (abierto en binario) sin cargarlo entero.
+
+    Produce (tema, nota) para cada nota y (tema, None) al empezar cada tema, para que los
+    temas vacíos también se importen. Ignora app_settings y cualquier otra clave.
+    """
+    stream = _JsonStream(file)
+    for key in stream.items():
+        if key != "app_data":
+            stream.value()
+            continue
+        for theme in stream.items():
+            yield theme, None
+            for note in stream.array():
+                yield theme, note
+
+
+def import_legacy_json(data_manager, json_path, chunk_size=5000, progress=None):
+    """
+    Importa `json_path` en la base de datos de `data_manager`. Los temas que ya existen se
+    completan con las notas importadas.
+
+    Parameters
+    ----------
+    data_manager : DataManager
+        Destino. Las escrituras van por DataManager.write (hilo escritor incluido).
+    json_path : str
+        Archivo en el formato anterior.
+    chunk_size : int
+        Notas por transacción.
+    progress : callable, optional
+        `progress(notas_importadas, bytes_leídos, bytes_totales)` tras cada bloque.
+
+    Returns
+    -------
+    int
+        Número de notas importadas en esta ejecución (0 si ya estaba importado).
+    """
+    stat = os.stat(json_path)
+    # El mismo archivo sin modificar se reconoce por ruta, tamaño y fecha.
+    source = f"{os.path.abspath(json_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+    def read_progress(conn):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS import_progress (
+                source TEXT PRIMARY KEY,
+                notes_done INTEGER NOT NULL,
+                finished INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        conn.commit()
+        row = conn.execute("SELECT notes_done, finished FROM import_progress WHERE source = ?", (source,)).fetchone()
+        return (row[0], bool(row[1])) if row else (0, False)
+
+    already_done, finished = data_manager.write(read_progress)
+    if finished:
+        return 0
+
+    theme_ids = {}
+    pending_themes, pending_notes = [], []
+    notes_seen = already_done
+    imported = 0
+
+    def write_chunk(themes, notes, done, is_final):
+        def job(conn):
+            for theme in themes:
+                conn.execute("INSERT OR IGNORE INTO themes (name) VALUES (?)", (theme,))
+                theme_ids[theme] = conn.execute("SELECT id FROM themes WHERE name = ?", (theme,)).fetchone()[0]
+            conn.executemany(data_manager.INSERT_NOTE_SQL,
+                             [data_manager.note_insert_params(theme_ids[theme], note) for theme, note in notes])
+            conn.execute("INSERT OR REPLACE INTO import_progress (source, notes_done, finished) VALUES (?, ?, ?)",
+                         (source, done, int(is_final)))
+            conn.commit()
+        data_manager.write(job)
+
+    with open(json_path, "rb") as file:
+        position = 0
+        for theme, note in iter_legacy_notes(file):
+            if note is None:
+                if theme not in theme_ids:
+                    theme_ids[theme] = None
+                    pending_themes.append(theme)
+                continue
+            position += 1
+            if position <= already_done:
+                continue # Importada en una ejecución anterior.
+            pending_notes.append((theme, note))
+            notes_seen = position
+            if len(pending_notes) >= chunk_size:
+                write_chunk(pending_themes, pending_notes, notes_seen, False)
+                imported += len(pending_notes)
+                pending_themes, pending_notes = [], []
+                if progress: progress(notes_seen, file.tell(), stat.st_size)
+        write_chunk(pending_themes, pending_notes, notes_seen, True)
+        imported += len(pending_notes)
+        if progress: progress(notes_seen, stat.st_size, stat.st_size)
+    return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra un archivo JSON del formato anterior a la base de datos SQLite.")
+    parser.add_argument("json_path", nargs="?", default=LEGACY_DATA_FILE, help="Archivo JSON a importar.")
+    parser.add_argument("--db", default=DATA_FILE, help="Base de datos de destino.")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Notas por transacción.")
+    args = parser.parse_args()
+
+    from data_manager import DataManager
+    manager = DataManager(args.db)
+    start = time.perf_counter()
+
+    def report(done, bytes_read, total_bytes):
+        print(f"\r  {done} notas, {bytes_read / max(total_bytes, 1):.0%} del archivo", end="", flush=True)
+
+    try:
+        imported = import_legacy_json(manager, args.json_path, args.chunk_size, progress=report)
+    finally:
+        manager.close()
+    print(f"\n{imported} notas importadas en {time.perf_counter() - start:.1f} s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
 # main.py
 # Punto de entrada de la aplicación Nexus Notes.
 # Su única responsabilidad es inicializar y ejecutar la aplicación.
+import multiprocessing
 import tkinter as tk
 from app_logic import Millon_note
 
 if __name__ == "__main__":
+    # Las fórmulas se renderizan en procesos aparte (formula_pool): necesario en el ejecutable congelado.
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = Millon_note(root)
     root.mainloop()
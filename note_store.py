@@ -0,0 +1,229 @@
+# note_store.py
+# Estructuras en memoria de las notas de la aplicación.
+
+# Campo sin asignar (distinto de None, que es un valor válido).
+_MISSING = object()
+
+
+class Note:
+    """
+    Registro compacto de una nota, con la interfaz de diccionario que usa la aplicación.
+
+    Con cientos de miles de notas el diccionario por nota (trece claves más su tabla hash)
+    costaba varias veces más que los propios datos numéricos. Este registro guarda cada
+    campo en un slot: sin __dict__ ni tabla hash por instancia. Se sigue usando igual
+    (`note["pos_x"] = 10`, `note.get("color")`, `note.update({...})`); los campos que nunca
+    se asignaron se comportan como claves ausentes.
+
+    Cada asignación que cambia un valor marca el campo en una máscara de bits; DataManager.
+    update_note la consume con take_dirty() para escribir solo esas columnas: mover un
+    satélite ya no reescribe el contenido completo de la nota. Construir una Note (desde la
+    base de datos o tras insertarla) la deja limpia.
+    """
+    # Mismo orden que DataManager._NOTE_COLUMNS, para construirla directamente desde una fila.
+    FIELDS = ("id", "titulo", "type", "contenido", "path", "anclado", "pos_x", "pos_y", "color", "width",
+              "img_width", "img_height", "aspect")
+    __slots__ = FIELDS + ("_dirty",)
+    _BITS = {field: 1 << index for index, field in enumerate(FIELDS)}
+
+    def __init__(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            if key not in self._BITS:
+                raise KeyError(key)
+            setattr(self, key, value)
+        self._dirty = 0
+
+    @classmethod
+    def from_values(cls, id, titulo, type, contenido, path, anclado, pos_x, pos_y, color, width,
+                    img_width, img_height, aspect):
+        """
+        Nota limpia a partir de los valores de FIELDS, en orden.
+
+        Es el constructor de load_data: asignar cada slot por su nombre cuesta menos de la
+        mitad que recorrer FIELDS con setattr, y se llama una vez por nota cargada.
+        """
+        note = object.__new__(cls)
+        note.id = id; note.titulo = titulo; note.type = type; note.contenido = contenido
+        note.path = path; note.anclado = anclado; note.pos_x = pos_x; note.pos_y = pos_y
+        note.color = color; note.width = width; note.img_width = img_width
+        note.img_height = img_height; note.aspect = aspect
+        note._dirty = 0
+        return note
+
+    def __getitem__(self, key):
+        if key not in self._BITS:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        bit = self._BITS[key]
+        if getattr(self, key, _MISSING) != value:
+            self._dirty |= bit
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self._BITS and hasattr(self, key)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __repr__(self):
+        return f"Note({dict(self.items())!r})"
+
+    def get(self, key, default=None):
+        if key not in self._BITS:
+            return default
+        return getattr(self, key, default)
+
+    def keys(self):
+        return [field for field in self.FIELDS if hasattr(self, field)]
+
+    def items(self):
+        return [(field, getattr(self, field)) for field in self.keys()]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    @property
+    def dirty(self):
+        """Campos modificados desde el último guardado."""
+        return {field for field, bit in self._BITS.items() if self._dirty & bit}
+
+    def take_dirty(self):
+        """Devuelve los campos modificados y deja la nota marcada como guardada."""
+        dirty = self.dirty
+        self._dirty = 0
+        return dirty
+
+
+class NoteStore:
+    """
+    Todas las notas cargadas, con índices para que las operaciones habituales sean O(1).
+
+    Se sitúa entre DataManager (que la construye en load_data) y la aplicación:
+
+    - ID de nota -> nota, para buscar sin recorrer listas.
+    - Tema -> IDs de sus notas, en orden (un dict usado como conjunto ordenado, de modo que
+      añadir y quitar no desplaza ningún elemento).
+    - ID de nota -> tema, y el conjunto de IDs de las notas ancladas.
+
+    El estado 'anclado' debe cambiarse con set_pinned() para mantener su índice al día.
+    """
+    def __init__(self):
+        self._notes = {}         # id -> Note
+        self._theme_ids = {}     # tema -> {id: None}, en orden
+        self._theme_of = {}      # id -> tema
+        self._pinned = set()     # ids de las notas ancladas
+        # Temas de los que solo se conocen las notas ancladas (carga diferida).
+        self.partial_themes = set()
+
+    # --- Temas ---
+
+    def __contains__(self, theme):
+        return theme in self._theme_ids
+
+    def __len__(self):
+        return len(self._theme_ids)
+
+    def themes(self):
+        return list(self._theme_ids)
+
+    def add_theme(self, theme):
+        self._theme_ids.setdefault(theme, {})
+
+    def rename_theme(self, old_name, new_name):
+        ids = self._theme_ids[new_name] = self._theme_ids.pop(old_name)
+        for note_id in ids:
+            self._theme_of[note_id] = new_name
+        if old_name in self.partial_themes:
+            self.partial_themes.discard(old_name)
+            self.partial_themes.add(new_name)
+
+    def remove_theme(self, theme):
+        """Quita un tema y sus notas. Devuelve las notas quitadas."""
+        self.partial_themes.discard(theme)
+        return [self._forget(note_id) for note_id in self._theme_ids.pop(theme, ())]
+
+    def load_theme(self, theme, notes):
+        """
+        Sustituye las notas de un tema cargado de forma diferida por su lista completa.
+
+        Las notas que ya estaban en memoria (las ancladas) conservan su objeto, porque los
+        satélites abiertos tienen referencias a ellas.
+        """
+        ids = self._theme_ids.setdefault(theme, {})
+        loaded = {}
+        for note in notes:
+            note_id = note['id']
+            if note_id not in ids:
+                self._index(theme, note)
+            loaded[note_id] = None
+        self._theme_ids[theme] = loaded
+        self.partial_themes.discard(theme)
+
+    # --- Notas ---
+
+    def get(self, note_id):
+        return self._notes.get(note_id)
+
+    def theme_of(self, note_id):
+        return self._theme_of.get(note_id)
+
+    def notes(self, theme):
+        """Notas de un tema, en orden."""
+        notes = self._notes
+        return [notes[note_id] for note_id in self._theme_ids.get(theme, ())]
+
+    def pinned_notes(self):
+        return [self._notes[note_id] for note_id in self._pinned]
+
+    def add(self, theme, note):
+        self._theme_ids.setdefault(theme, {})[note['id']] = None
+        self._index(theme, note)
+
+    def add_many(self, theme, notes):
+        """
+        Añade al final de un tema una lista de Note, de una vez.
+
+        Es la carga de load_data: en lugar de tres inserciones y dos llamadas por nota, cada
+        índice se actualiza con una sola operación sobre toda la lista.
+        """
+        ids = [note.id for note in notes]
+        self._theme_ids.setdefault(theme, {}).update(dict.fromkeys(ids))
+        self._notes.update(zip(ids, notes))
+        self._theme_of.update(dict.fromkeys(ids, theme))
+        self._pinned.update([note.id for note in notes if note.anclado])
+
+    def remove(self, note_id):
+        """Quita una nota. Devuelve la nota quitada, o None si no existía."""
+        theme = self._theme_of.get(note_id)
+        if theme is None:
+            return None
+        del self._theme_ids[theme][note_id]
+        return self._forget(note_id)
+
+    def set_pinned(self, note_id, pinned):
+        self._notes[note_id]["anclado"] = pinned
+        if pinned:
+            self._pinned.add(note_id)
+        else:
+            self._pinned.discard(note_id)
+
+    def _index(self, theme, note):
+        note_id = note['id']
+        self._notes[note_id] = note
+        self._theme_of[note_id] = theme
+        if note.get("anclado"):
+            self._pinned.add(note_id)
+
+    def _forget(self, note_id):
+        self._pinned.discard(note_id)
+        del self._theme_of[note_id]
+        return self._notes.pop(note_id)
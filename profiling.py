@@ -0,0 +1,101 @@
+# profiling.py
+# Capa de perfilado ligera: intervalos de tiempo con nombre, contadores y un búfer circular
+# con las mediciones recientes, que se puede volcar a JSON o ver en la ventana de estadísticas.
+#
+# Desactivada (lo normal), `timed` devuelve la función sin envolver y `span` un contexto vacío
+# compartido, así que el coste es prácticamente nulo.
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from config import PROFILING_ENABLED, PROFILING_RING_SIZE
+
+ENABLED = PROFILING_ENABLED or os.environ.get("NEXUS_PROFILE") == "1"
+
+_lock = threading.Lock() # El hilo escritor de DataManager también registra mediciones.
+_recent = deque(maxlen=PROFILING_RING_SIZE) # (nombre, inicio en s desde el arranque, duración en ms)
+_totals = {}   # nombre -> [llamadas, ms totales, ms máximo]
+_counters = {} # nombre -> valor
+_origin = time.perf_counter()
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def record(name, start, seconds):
+    """Registra una medición de `seconds` que empezó en `start` (valor de perf_counter)."""
+    ms = seconds * 1000
+    with _lock:
+        _recent.append((name, round(start - _origin, 6), round(ms, 4)))
+        totals = _totals.get(name)
+        if totals is None:
+            _totals[name] = [1, ms, ms]
+        else:
+            totals[0] += 1
+            totals[1] += ms
+            if ms > totals[2]: totals[2] = ms
+
+
+@contextlib.contextmanager
+def _span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, start, time.perf_counter() - start)
+
+
+def span(name):
+    """Contexto que mide el bloque: `with span("satellite.layout"): ...`."""
+    return _span(name) if ENABLED else _NULL_SPAN
+
+
+def timed(name):
+    """Decorador que mide cada llamada a la función. Desactivado, no la envuelve."""
+    def decorator(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, start, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def count(name, amount=1):
+    """Suma `amount` al contador `name` (renders de fórmulas, imágenes decodificadas...)."""
+    if ENABLED:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + amount
+
+
+def snapshot():
+    """Copia del estado actual: totales por nombre, contadores y mediciones recientes."""
+    with _lock:
+        return {
+            "totals": {name: {"calls": calls, "total_ms": round(total, 3), "avg_ms": round(total / calls, 3),
+                              "max_ms": round(peak, 3)}
+                       for name, (calls, total, peak) in _totals.items()},
+            "counters": dict(_counters),
+            "recent": [{"name": name, "start_s": start, "ms": ms} for name, start, ms in _recent],
+        }
+
+
+def dump_json(path):
+    """Escribe snapshot() en `path`."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f, indent=2, ensure_ascii=False)
+
+
+def reset():
+    with _lock:
+        _recent.clear()
+        _totals.clear()
+        _counters.clear()
@@ -3,11 +3,25 @@
 # Encapsula toda la lógica de renderizado, movimiento y redimensionamiento.
 import tkinter as tk
 from tkinter import messagebox
-from PIL import Image, ImageTk, ImageDraw
-import matplotlib.pyplot as plt
-import io
 import re
+import time
+from collections import deque
 from ui_components import CustomScrollbar # Importamos nuestro componente
+import profiling
+from profiling import span
+from formula_cache import FormulaCache
+from formula_pool import FormulaRenderPool, estimate_formula_size
+from text_layout import TextLayout
+from background_cache import BackgroundImageCache
+from image_utils import build_mipmaps, pick_level, nearest_derivative
+from config import (FORMULA_CACHE_DIR, FORMULA_CACHE_MAX_BYTES, FORMULA_MEMORY_CACHE_SIZE, FORMULA_DPI, FORMULA_FONTSIZE,
+                    FORMULA_RENDER_WORKERS,
+                    IMAGE_DERIVATIVE_SIZES, SATELLITE_RESTORE_BUDGET_MS)
+# PIL se importa dentro de las funciones que lo usan, y matplotlib solo en los procesos de
+# formula_pool: así el arranque no paga su carga si ninguna nota anclada tiene imágenes o fórmulas.
+
+# Fragmentos $...$ del contenido de una nota. Con el grupo, re.split conserva las fórmulas.
+FORMULA_PATTERN = re.compile(r'(\$.*?\$)')
 
 class SatelliteManager:
 
@@ -23,7 +37,53 @@ class SatelliteManager:
         
         self.app = app
         self.root = app.root
-        
+        self._formula_cache = None
+        self._formula_pool = None
+        self._text_layout = None
+        self.background_cache = BackgroundImageCache(self.create_rounded_rectangle_image)
+        self._restore_queue = deque()
+
+    @property
+    def formula_cache(self):
+        """Caché de fórmulas; se crea (y escanea su carpeta) la primera vez que hace falta."""
+        if self._formula_cache is None:
+            self._formula_cache = FormulaCache(
+                FORMULA_CACHE_DIR,
+                max_disk_bytes=FORMULA_CACHE_MAX_BYTES, max_memory_items=FORMULA_MEMORY_CACHE_SIZE
+            )
+        return self._formula_cache
+
+    @property
+    def text_layout(self):
+        """Motor de medición de texto para la fuente de las notas (se crea tras setup_fonts)."""
+        if self._text_layout is None:
+            self._text_layout = TextLayout(self.app.font_normal)
+        return self._text_layout
+
+    @property
+    def formula_pool(self):
+        """Renderizado de fórmulas en segundo plano; sus procesos se lanzan al primer fallo de caché."""
+        if self._formula_pool is None:
+            self._formula_pool = FormulaRenderPool(self.root, self.formula_cache, FORMULA_DPI, FORMULA_FONTSIZE,
+                                                   max_workers=FORMULA_RENDER_WORKERS)
+        return self._formula_pool
+
+    def request_formula_images(self, formulas, color, callback):
+        """
+        Pide las imágenes de las fórmulas $...$ dadas sin bloquear la interfaz.
+
+        Devuelve (listas, pendientes) como FormulaRenderPool.request: las que ya estaban en
+        caché y las que se están renderizando, que llegarán por `callback(fórmula, color, imagen)`.
+        """
+        if not formulas:
+            return {}, []
+        return self.formula_pool.request(formulas, color, callback)
+
+    def shutdown(self):
+        """Detiene los procesos de renderizado de fórmulas (al cerrar la aplicación)."""
+        if self._formula_pool is not None:
+            self._formula_pool.shutdown()
+
     def create_rounded_rectangle_image(self, w, h, r, c):
         """
         Crea una imagen redonda con un rectángulo con esquina redondeada.
@@ -44,30 +104,29 @@ class SatelliteManager:
         ImageTk.PhotoImage
             Imagen redonda con el rectángulo
         """
+        from PIL import Image, ImageTk, ImageDraw
         img = Image.new("RGBA", (w, h), (0,0,0,0))
         draw = ImageDraw.Draw(img)
         draw.rounded_rectangle((0,0,w,h), r, fill=c)
         return ImageTk.PhotoImage(img)
 
-    def create_satellite_window(self, theme_name, note_index):
+    @profiling.timed("satellite.create")
+    def create_satellite_window(self, note_id):
         """
         Crea una ventana flotante asociada a una nota.
 
         Parameters
         ----------
-        theme_name : str
-            Nombre del tema al que pertenece la nota.
-        note_index : int
-            Índice de la nota en el tema.
+        note_id : int
+            ID de la nota.
 
         Returns
         -------
         None
         """
-        note_data = self.app.datos[theme_name][note_index]
-        note_id = note_data['id']
-        sat_id = f"{theme_name}_{note_id}"
-        if sat_id in self.app.open_satellites: return
+        from PIL import Image, ImageTk
+        note_data = self.app.note_store.get(note_id)
+        if note_data is None or note_id in self.app.open_satellites: return
         
         CHROMA = '#abcdef'
         satellite = tk.Toplevel(self.root)
@@ -99,15 +158,23 @@ class SatelliteManager:
 
         if note_data.get("type") == "image":
             try:
-                img_orig = Image.open(note_data["path"])
+                if note_data.get("img_width") and note_data.get("aspect"):
+                    # Metadatos guardados al importar: abrimos el derivado más cercano al tamaño
+                    # mostrado en lugar de decodificar el original completo.
+                    satellite.aspect = note_data["aspect"]
+                    nw = note_data.get("width") or min(note_data["img_width"], 500)
+                    img_orig = Image.open(nearest_derivative(note_data["path"], nw, IMAGE_DERIVATIVE_SIZES))
+                else:
+                    img_orig = Image.open(note_data["path"])
+                    w, h = img_orig.size
+                    satellite.aspect = h/w if w > 0 else 1
+                    nw = note_data.get("width") or min(w, 500)
                 satellite.original_image = img_orig
-                w, h = img_orig.size
-                satellite.aspect = h/w if w > 0 else 1
-                
-                nw = note_data.get("width", min(w, 500))
                 nh = int(nw * satellite.aspect)
 
-                tk_img = ImageTk.PhotoImage(img_orig.resize((nw,nh), Image.Resampling.LANCZOS))
+                profiling.count("image_decodes") # Image.open es perezoso: se decodifica al redimensionar.
+                with span("satellite.image_decode_resize"):
+                    tk_img = ImageTk.PhotoImage(img_orig.resize((nw,nh), Image.Resampling.LANCZOS))
                 img_label = tk.Label(satellite, image=tk_img, bg=CHROMA, bd=0)
                 img_label.image = tk_img
                 img_label.pack()
@@ -115,7 +182,7 @@ class SatelliteManager:
                 satellite.geometry(f"{nw}x{nh}+{pos_x}+{pos_y}")
                 
                 menu = tk.Menu(satellite, tearoff=0)
-                menu.add_command(label="Desanclar", command=lambda: self.app.toggle_pin_note(theme=theme_name, manual_idx=note_index))
+                menu.add_command(label="Desanclar", command=lambda: self.app.toggle_pin_note(note_id=note_id))
                 img_label.bind("<Button-3>", lambda e: menu.post(e.x_root, e.y_root))
                 
                 def save_geometry(e):
@@ -149,6 +216,9 @@ class SatelliteManager:
                     Comienza la geometría actual de la ventana flotante y guarda los valores
                     de ancho y alto en los atributos de la ventana flotante.
 
+                    La primera vez también precalcula la pirámide de resoluciones de la imagen,
+                    de la que salen las vistas previas rápidas durante el arrastre.
+
                     Parameters
                     ----------
                     e : Event
@@ -160,11 +230,31 @@ class SatelliteManager:
                         """
                     satellite.sw, satellite.sh = satellite.winfo_width(), satellite.winfo_height()
                     satellite.sx, satellite.sy = e.x_root, e.y_root
+                    if satellite.mipmaps is None:
+                        satellite.mipmaps = build_mipmaps(satellite.original_image)
+
+                def show_image(image):
+                    new_tk_img = ImageTk.PhotoImage(image)
+                    img_label.config(image=new_tk_img)
+                    img_label.image = new_tk_img
+                    satellite.geometry(f"{image.width}x{image.height}")
+
+                def apply_draft_resize():
+                    """Vista previa de calidad borrador desde el nivel de la pirámide más cercano."""
+                    satellite.resize_scheduled = False
+                    nw = satellite.pending_width
+                    if nw is None: return # El botón ya se soltó: manda la versión final.
+                    nh = max(1, int(nw * satellite.aspect))
+                    level = pick_level(satellite.mipmaps, nw)
+                    show_image(level.resize((nw, nh), Image.Resampling.BILINEAR))
                 
                 def do_resize(e):
                     """
                     Redimensiona la ventana flotante en tiempo real.
 
+                    Los eventos de movimiento se agrupan: solo se guarda el ancho deseado y se
+                    programa un único repintado para cuando Tk quede libre.
+
                     Parameters
                     ----------
                     e : Event
@@ -174,16 +264,33 @@ class SatelliteManager:
                     -------
                     None
                     """
-                    nw = max(50, satellite.sw + (e.x_root - satellite.sx))
-                    nh = int(nw * satellite.aspect)
-                    new_tk_img = ImageTk.PhotoImage(satellite.original_image.resize((nw,nh), Image.Resampling.LANCZOS))
-                    img_label.config(image=new_tk_img)
-                    img_label.image = new_tk_img
-                    satellite.geometry(f"{nw}x{nh}")
-                
+                    satellite.pending_width = max(50, satellite.sw + (e.x_root - satellite.sx))
+                    if not satellite.resize_scheduled:
+                        satellite.resize_scheduled = True
+                        satellite.after_idle(apply_draft_resize)
+
+                def finish_resize(e):
+                    """Al soltar, una única pasada LANCZOS desde el original y se guarda el nuevo ancho."""
+                    nw = satellite.pending_width
+                    satellite.pending_width = None
+                    if nw is None: return # Clic sin arrastre.
+                    nh = max(1, int(nw * satellite.aspect))
+                    if nw > satellite.original_image.width and note_data.get("img_width"):
+                        # Se amplió por encima del derivado cargado: pasamos a uno mayor (o al original).
+                        satellite.original_image = Image.open(nearest_derivative(note_data["path"], nw, IMAGE_DERIVATIVE_SIZES))
+                        satellite.mipmaps = None
+                        profiling.count("image_decodes")
+                    with span("satellite.image_resize"):
+                        show_image(satellite.original_image.resize((nw, nh), Image.Resampling.LANCZOS))
+                    note_data.update({'width': nw})
+                    self.app.data_manager.update_note(note_data['id'], note_data)
+
+                satellite.mipmaps = None
+                satellite.pending_width = None
+                satellite.resize_scheduled = False
                 handle.bind("<Button-1>", start_resize)
                 handle.bind("<B1-Motion>", do_resize)
-                handle.bind("<ButtonRelease-1>", save_geometry)
+                handle.bind("<ButtonRelease-1>", finish_resize)
             
             except FileNotFoundError:
                 satellite.destroy()
@@ -194,51 +301,63 @@ class SatelliteManager:
         else:
             bg = note_data.get("color", self.app.POSTIT_COLORS["Amarillo Clásico"])
             fg = "#000000"
-            try: px_size = int(3.0 * satellite.winfo_fpixels('1i'))
-            except: px_size = 288
+            try: screen_dpi = satellite.winfo_fpixels('1i')
+            except: screen_dpi = 96.0
+            px_size = int(3.0 * screen_dpi)
             
             satellite.geometry(f"{px_size}x{px_size}+{pos_x}+{pos_y}")
             satellite.resizable(False, False)
             
             bg_label = tk.Label(satellite, bd=0, bg=CHROMA)
-            bg_img = self.create_rounded_rectangle_image(px_size, px_size, 15, bg)
+            bg_key, bg_img = self.background_cache.acquire(px_size, px_size, 15, bg, screen_dpi / 96.0)
             bg_label.config(image=bg_img)
             bg_label.image = bg_img
+            bg_label.bind("<Destroy>", lambda e: self.background_cache.release(bg_key))
             bg_label.pack(fill="both", expand=True)
             
             header = tk.Frame(bg_label, bg=bg)
             header.pack(side="top", fill="x", padx=(15, 5), pady=(10, 5))
             
             # No mostramos el título en las ventanas satélite.
-            # Dejamos el header vacío (el botón de cerrar se añadirá más abajo).
+            # Dejamos el header vacío (solo con el botón de cerrar, justo debajo).
             # Si en el futuro quieres reactivar el título, podemos añadir una opción de configuración.
             
+            # Creamos ya el botón de cerrar: su altura forma parte del cálculo del área de contenido.
+            close_btn = tk.Button(header, text="✖", command=lambda: self.app.toggle_pin_note(note_id=note_id), bg=bg, fg=fg, bd=0, font=("Segoe UI", 8, "bold"))
+            close_btn.pack(side="right")
+
             # --- INICIO DE LA LÓGICA DE CENTRADO DEFINITIVA ---
-            temp_container = tk.Frame(bg_label)
-            temp_text = tk.Text(temp_container, font=self.app.font_normal, wrap="word", bd=0, highlightthickness=0)
-            temp_scrollbar = CustomScrollbar(temp_container, command=temp_text.yview)
-            temp_text.config(yscrollcommand=temp_scrollbar.set)
-            
-            temp_text.images = []
-            for part in re.compile(r'(\$.*?\$)').split(note_data.get("contenido", "")):
-                if re.match(r'(\$.*?\$)', part) and len(part) > 2:
-                    try:
-                        fig = plt.figure(dpi=150); fig.text(0,0,part,fontsize=12,color=fg)
-                        buf = io.BytesIO(); fig.savefig(buf, format='png', transparent=True, bbox_inches='tight', pad_inches=0.1); plt.close(fig); buf.seek(0)
-                        tk_img = ImageTk.PhotoImage(Image.open(buf)); temp_text.images.append(tk_img)
-                        temp_text.image_create(tk.END, image=tk_img)
-                    except: temp_text.insert(tk.END, " [Fórmula Inválida] ")
-                else: temp_text.insert(tk.END, part)
-            
-            satellite.update_idletasks()
-            lo, hi = temp_scrollbar.get()
-            temp_container.destroy()
+            # Medimos el contenido una sola vez (métricas de la fuente + tamaño de las fórmulas)
+            # para elegir entre la etiqueta centrada y el texto con scroll, sin renderizarlo
+            # primero en un widget temporal. Las fórmulas que no están en caché se renderizan en
+            # segundo plano: mientras, se mide con un tamaño estimado y se muestra un hueco vacío.
+            content = note_data.get("contenido") or ""
+            formulas = [part for part in FORMULA_PATTERN.findall(content) if len(part) > 2]
+            with span("satellite.formulas"):
+                formula_images, pending = self.request_formula_images(formulas, fg, lambda *args: on_formula_ready(*args))
+            pending = set(pending)
+
+            def layout_parts():
+                for part in FORMULA_PATTERN.split(content):
+                    if part in pending:
+                        yield estimate_formula_size(part, FORMULA_DPI, FORMULA_FONTSIZE)
+                    elif part in formula_images:
+                        yield formula_images[part].size if formula_images[part] is not None else " [Fórmula Inválida] "
+                    else: yield part
+
+            content_w = px_size - 15 - 2 # padx del contenedor y borde interno del tk.Text
+            content_h = px_size - (close_btn.winfo_reqheight() + 10 + 5) - 15 - 2 # cabecera y pady inferior
+            with span("satellite.layout"):
+                fits = self.text_layout.fits(layout_parts(), content_w, content_h)
 
-            if lo == 0.0 and hi == 1.0:
+            text_widget = None
+            formula_slots = [] # (nombre de la imagen incrustada en el tk.Text, fórmula)
+
+            if fits:
                 content_wrapper = tk.Frame(bg_label, bg=bg)
                 content_wrapper.pack(expand=True, fill="both", padx=15, pady=(0, 15))
-                plain_content = re.sub(r'\$.*?\$', '[Fórmula]', note_data.get("contenido", ""))
-                content_label = tk.Label(content_wrapper, text=plain_content, font=self.app.font_normal, bg=bg, fg=fg, justify="center")
+                plain_content = FORMULA_PATTERN.sub('[Fórmula]', content)
+                content_label = tk.Label(content_wrapper, text=plain_content, font=self.app.font_normal, bg=bg, fg=fg, justify="center", wraplength=content_w)
                 content_label.place(relx=0.5, rely=0.5, anchor="center")
                 for w in [content_wrapper, content_label]:
                     w.bind("<Button-1>", start_move)
@@ -266,38 +385,94 @@ class SatelliteManager:
                 for widget in [text_widget, scrollbar]:
                     widget.bind("<MouseWheel>", on_mouse_wheel); widget.bind("<Button-4>", on_mouse_wheel); widget.bind("<Button-5>", on_mouse_wheel)
                 
-                text_widget.images = []; text_widget.config(state="normal"); text_widget.delete("1.0", tk.END)
-                for part in re.compile(r'(\$.*?\$)').split(note_data.get("contenido", "")):
-                    if re.match(r'(\$.*?\$)', part) and len(part) > 2:
-                        try:
-                            fig = plt.figure(dpi=150); fig.text(0,0,part,fontsize=12,color=fg)
-                            buf = io.BytesIO(); fig.savefig(buf, format='png', transparent=True, bbox_inches='tight', pad_inches=0.1); plt.close(fig); buf.seek(0)
-                            tk_img = ImageTk.PhotoImage(Image.open(buf)); text_widget.images.append(tk_img)
-                            text_widget.image_create(tk.END, image=tk_img)
-                        except Exception as e: print(f"Error: {e}"); text_widget.insert(tk.END, " [Fórmula Inválida] ")
+                text_widget.images = {}; text_widget.config(state="normal"); text_widget.delete("1.0", tk.END)
+                for part in FORMULA_PATTERN.split(content):
+                    if part in pending:
+                        # Hueco transparente del tamaño estimado; show_formula() pone la imagen real.
+                        width, height = estimate_formula_size(part, FORMULA_DPI, FORMULA_FONTSIZE)
+                        tk_img = tk.PhotoImage(width=width, height=height)
+                        name = text_widget.image_create(tk.END, image=tk_img)
+                        text_widget.images[name] = tk_img; formula_slots.append((name, part))
+                    elif part in formula_images:
+                        if formula_images[part] is not None:
+                            tk_img = ImageTk.PhotoImage(formula_images[part])
+                            name = text_widget.image_create(tk.END, image=tk_img)
+                            text_widget.images[name] = tk_img; formula_slots.append((name, part))
+                        else: text_widget.insert(tk.END, " [Fórmula Inválida] ")
                     else: text_widget.insert(tk.END, part)
                 text_widget.config(state="disabled")
             # --- FIN DE LA LÓGICA DE CENTRADO ---
 
+            def show_formula(formula, image):
+                """Sustituye en su sitio las imágenes de `formula` (o su hueco) por `image`."""
+                if text_widget is None:
+                    return
+                text_widget.config(state="normal")
+                for slot in [slot for slot in formula_slots if slot[1] == formula]:
+                    if image is None:
+                        index = text_widget.index(slot[0])
+                        text_widget.delete(index)
+                        text_widget.insert(index, " [Fórmula Inválida] ")
+                        formula_slots.remove(slot)
+                        del text_widget.images[slot[0]]
+                    else:
+                        tk_img = text_widget.images[slot[0]] = ImageTk.PhotoImage(image)
+                        text_widget.image_configure(slot[0], image=tk_img)
+                text_widget.config(state="disabled")
+
+            def on_formula_ready(formula, color, image):
+                """Llega una fórmula renderizada en segundo plano (en el hilo de Tk)."""
+                if not satellite.winfo_exists():
+                    return # El satélite se cerró mientras se renderizaba.
+                formula_images[formula] = image
+                show_formula(formula, image)
+                if formula not in pending:
+                    return
+                pending.discard(formula)
+                # Con todas las medidas reales, si el contenido pasa a caber (o deja de caber) se
+                # rehace el satélite con la otra presentación; ahora todo sale de la caché.
+                if not pending and self.text_layout.fits(layout_parts(), content_w, content_h) != fits:
+                    if self.app.open_satellites.get(note_id) is satellite:
+                        self.app.open_satellites.pop(note_id).destroy()
+                        self.create_satellite_window(note_id)
+
             for w in [bg_label, header]:
                 w.bind("<Button-1>", start_move)
                 w.bind("<B1-Motion>", do_move)
                 w.bind("<ButtonRelease-1>", lambda e, n=note_data: self.app.data_manager.update_note(n['id'], n))
 
-            # Reemplaza la línea original por esta. Pasamos el ID de la nota, que es la verdad absoluta.
-            note_id = note_data['id']
-            close_btn = tk.Button(header, text="✖", command=lambda: self.app.toggle_pin_note(note_id=note_id, theme=theme_name), bg=bg, fg=fg, bd=0, font=("Segoe UI", 8, "bold"))
-
-            close_btn.pack(side="right")
         
-        self.app.open_satellites[sat_id] = satellite
+        self.app.open_satellites[note_id] = satellite
 
     def initialize_satellites(self):
         """
         Inicializa las ventanas satélite correspondientes a las notas ancladas.
+
+        No las crea todas de golpe: las encola (primero las que caen dentro de la pantalla) y
+        las va creando en porciones con `root.after`, cada una limitada a
+        SATELLITE_RESTORE_BUDGET_MS, para que la ventana principal responda desde el principio.
         """
-        
-        for theme, notes in list(self.app.datos.items()):
-            for i, note in enumerate(notes):
-                if note.get("anclado", False):
-                    self.create_satellite_window(theme, i)
\ No newline at end of file
+        screen_w, screen_h = self.root.winfo_screenwidth(), self.root.winfo_screenheight()
+        pending = []
+        for note in self.app.note_store.pinned_notes():
+            x, y = note.get("pos_x") or 0, note.get("pos_y") or 0
+            off_screen = not (0 <= x < screen_w and 0 <= y < screen_h)
+            pending.append((off_screen, y, x, note['id']))
+        pending.sort()
+        self._restore_queue = deque(note_id for *_, note_id in pending)
+        if self._restore_queue:
+            self.root.after(1, self._restore_next_slice)
+
+    def _restore_next_slice(self):
+        """Crea satélites pendientes hasta agotar el presupuesto de este fotograma (al menos uno)."""
+        deadline = time.perf_counter() + SATELLITE_RESTORE_BUDGET_MS / 1000
+        while self._restore_queue:
+            note_id = self._restore_queue.popleft()
+            # Entre porciones el usuario puede haber desanclado o borrado la nota.
+            note = self.app.note_store.get(note_id)
+            if note is not None and note.get("anclado", False):
+                self.create_satellite_window(note_id)
+            if time.perf_counter() >= deadline:
+                break
+        if self._restore_queue:
+            self.root.after(1, self._restore_next_slice)
@@ -0,0 +1,81 @@
+# text_layout.py
+# Motor de medición de texto para las ventanas satélite.
+# Calcula la altura que ocupará un contenido con ajuste por palabras (como un tk.Text con
+# wrap="word") a partir de las métricas de la fuente y del tamaño de las imágenes en línea,
+# sin crear ni dibujar ningún widget.
+import re
+
+# Palabras y bloques de espacios, por separado: el ajuste de línea solo corta en los espacios.
+_TOKEN_PATTERN = re.compile(r'\S+|\s+')
+
+
+class TextLayout:
+    """
+    Mide contenidos formados por texto e imágenes en línea para una fuente dada.
+
+    Los anchos de cada palabra se guardan en caché: las notas repiten mucho vocabulario y
+    cada `font.measure` es una llamada a Tcl.
+    """
+    def __init__(self, font):
+        self.font = font
+        self.line_height = font.metrics("linespace")
+        self._widths = {}
+
+    def _measure(self, token):
+        width = self._widths.get(token)
+        if width is None:
+            width = self._widths[token] = self.font.measure(token)
+        return width
+
+    def measure_height(self, parts, width, max_height=None):
+        """
+        Devuelve la altura en píxeles del contenido ajustado a `width`.
+
+        Parameters
+        ----------
+        parts : iterable
+            Fragmentos en orden: cadenas de texto o tuplas (ancho, alto) de imágenes en línea.
+        width : int
+            Ancho disponible en píxeles.
+        max_height : int, optional
+            Si se indica, la medición se detiene en cuanto se supera (basta para saber que no cabe).
+        """
+        width = max(1, width)
+        total = 0
+        line_w, line_h = 0, self.line_height
+
+        def new_line():
+            nonlocal total, line_w, line_h
+            total += line_h
+            line_w, line_h = 0, self.line_height
+
+        for part in parts:
+            if isinstance(part, tuple):
+                image_w, image_h = part
+                if line_w and line_w + image_w > width:
+                    new_line()
+                line_w += image_w
+                line_h = max(line_h, image_h)
+            else:
+                for line_index, line in enumerate(part.split("\n")):
+                    if line_index:
+                        new_line()
+                    for token in _TOKEN_PATTERN.findall(line):
+                        token_w = self._measure(token)
+                        if token[0].isspace():
+                            line_w += token_w # Los espacios al final de línea no fuerzan salto.
+                            continue
+                        if line_w and line_w + token_w > width:
+                            new_line()
+                        if token_w > width:
+                            # Palabra más ancha que la línea: Tk la corta por caracteres.
+                            full_lines, token_w = divmod(token_w, width)
+                            total += full_lines * line_h
+                        line_w += token_w
+            if max_height is not None and total > max_height:
+                return total
+        return total + line_h
+
+    def fits(self, parts, width, height):
+        """True si el contenido cabe en un área de `width` x `height` sin necesidad de scroll."""
+        return self.measure_height(parts, width, max_height=height) <= height
@@ -6,6 +6,7 @@ import tkinter as tk
 from tkinter import ttk, font
 import sv_ttk
 import platform
+import profiling
 
 # Intenta importar pywinstyles si está disponible
 try:
@@ -73,6 +74,8 @@ class UIBuilder:
         self.root.title("Nexus Notes")
         self.root.geometry("800x600")
         self.root.protocol("WM_DELETE_WINDOW", self.app.on_close)
+        if profiling.ENABLED:
+            self.root.bind("<F12>", lambda e: self.app.show_profiler_stats())
         if platform.system() == "Windows" and pywinstyles:
             pywinstyles.apply_style(self.root, "acrylic")
         sv_ttk.set_theme(self.app.current_theme)
@@ -131,9 +134,10 @@ class UIBuilder:
         self.app.search_var = tk.StringVar()
         search_entry = ttk.Entry(search_frame, textvariable=self.app.search_var, font=self.app.font_normal, width=40)
         search_entry.pack(side='left', fill='x', expand=True, ipady=2)
-        search_entry.bind('<Return>', self.app._refresh_notes_view)
+        search_entry.bind('<Return>', lambda e: self.app._run_search())
+        self.app.search_var.trace_add('write', self.app._on_search_changed)
         ttk.Button(search_frame, text="✖", command=self.app.clear_search, style="Toolbutton.TButton", width=3).pack(side='right', padx=(5,0))
-        ttk.Button(search_frame, text="🔍", command=self.app._refresh_notes_view, style="Toolbutton.TButton", width=3).pack(side='right')
+        ttk.Button(search_frame, text="🔍", command=self.app._run_search, style="Toolbutton.TButton", width=3).pack(side='right')
 
         self.app.listbox_apuntes = tk.Listbox(notes_frame, font=self.app.font_normal, bd=0, highlightthickness=0, exportselection=False)
         self.app.listbox_apuntes.pack(fill='both', expand=True, padx=10, pady=5)
@@ -3,7 +3,7 @@
 # Estos componentes están desacoplados de la lógica de la aplicación principal.
 
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, filedialog
 import platform
 
 # Intenta importar pywinstyles si está disponible, pero no hagas que sea un requisito estricto.
@@ -122,4 +122,39 @@ class ColorPickerDialog(tk.Toplevel):
         self.update_idletasks()
         x = self.master.winfo_x() + (self.master.winfo_width() - self.winfo_width()) // 2
         y = self.master.winfo_y() + (self.master.winfo_height() - self.winfo_height()) // 2
-        self.geometry(f"+{x}+{y}"); self.wait_window(); return self.result
\ No newline at end of file
+        self.geometry(f"+{x}+{y}"); self.wait_window(); return self.result
+
+# ---- VENTANA DE ESTADÍSTICAS DE RENDIMIENTO ----
+class ProfilerStatsWindow(tk.Toplevel):
+    """Tabla con los tiempos acumulados de profiling.snapshot(). `dump(path)` guarda el JSON."""
+    def __init__(self, parent, snapshot, dump, font_normal=None):
+        super().__init__(parent)
+        self.title("Rendimiento"); self.geometry("560x420")
+        if platform.system() == "Windows" and pywinstyles:
+            pywinstyles.apply_style(self, "acrylic")
+        self.snapshot, self.dump = snapshot, dump
+        main_frame = ttk.Frame(self, padding=10); main_frame.pack(expand=True, fill="both")
+        columns = ("calls", "total_ms", "avg_ms", "max_ms")
+        self.tree = ttk.Treeview(main_frame, columns=columns)
+        self.tree.heading("#0", text="Medición"); self.tree.column("#0", width=220)
+        for column, title in zip(columns, ("Llamadas", "Total (ms)", "Media (ms)", "Máx. (ms)")):
+            self.tree.heading(column, text=title); self.tree.column(column, width=75, anchor="e")
+        self.tree.pack(expand=True, fill="both")
+        self.counters_label = ttk.Label(main_frame, font=font_normal, justify="left"); self.counters_label.pack(fill="x", pady=(8, 8))
+        buttons_frame = ttk.Frame(main_frame); buttons_frame.pack(fill="x")
+        ttk.Button(buttons_frame, text="Guardar JSON", command=self._on_save).pack(side="right")
+        ttk.Button(buttons_frame, text="Actualizar", command=self.refresh, style="Accent.TButton").pack(side="right", padx=(0, 5))
+        self.refresh()
+
+    def refresh(self):
+        data = self.snapshot()
+        self.tree.delete(*self.tree.get_children())
+        for name, totals in sorted(data["totals"].items(), key=lambda item: -item[1]["total_ms"]):
+            self.tree.insert("", "end", text=name, values=(totals["calls"], f'{totals["total_ms"]:.1f}',
+                                                            f'{totals["avg_ms"]:.2f}', f'{totals["max_ms"]:.2f}'))
+        counters = "   ".join(f"{name}: {value}" for name, value in sorted(data["counters"].items()))
+        self.counters_label.config(text=counters or "Sin contadores todavía.")
+
+    def _on_save(self):
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".json", filetypes=[("JSON", "*.json")])
+        if path: self.dump(path)